@@ -1,24 +1,57 @@
 import os
-from datetime import datetime, timedelta
+import io
+import re
+import csv
+import json
+import gzip
+import base64
+import time
+import random
+import socket
+import logging
+import pickle
+import hashlib
+import hmac
+import tempfile
+import queue
+import atexit
+import threading
+from collections import deque, OrderedDict
+from types import MappingProxyType
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from datetime import date, datetime, timedelta, timezone
 import smtplib
 from email.message import EmailMessage
-from urllib.parse import quote_plus
-from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from dotenv import load_dotenv
+from email.utils import parseaddr
+from urllib.parse import quote, quote_plus
+from functools import lru_cache, wraps
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, has_app_context, make_response, stream_with_context, send_from_directory
+import click
+from dotenv import load_dotenv, dotenv_values
 import mysql.connector
 from mysql.connector import Error
 from werkzeug.utils import secure_filename
 import mimetypes
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# Load environment variables from .env if present
+# Load environment variables from .env if present (the process environment wins here;
+# runtime settings below layer .env on top instead, see current_settings())
+_PROCESS_ENV = dict(os.environ)
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change")
 app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 60 * 60 * 24 * 7  # 7 days for static assets
 
+# Number of reverse proxies in front of the app. Only then are X-Forwarded-For/-Proto honoured
+# (one entry per trusted hop, counted from the right); otherwise the peer address is the client.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0") or 0)
+if TRUSTED_PROXIES > 0:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
 # Optional: gzip compression if Flask-Compress is available
 try:
     from flask_compress import Compress  # type: ignore
@@ -38,7 +71,150 @@ DB_CONFIG = {
     "database": os.getenv("DB_NAME", "company_site"),
 }
 
-# Admin credentials are read from environment during login to reflect latest .env values
+# ---------------------- Runtime settings ----------------------
+# Values an admin can change while the app runs (admin credentials, webhook token, SMTP,
+# homepage stats) are read through current_settings(): an immutable snapshot of the
+# environment with .env applied on top. It is rebuilt only when a stat() of .env shows a
+# new file (checked at most every SETTINGS_CHECK_INTERVAL seconds), or right after this
+# process writes .env itself. Constants read at import (DB, pools, workers) still need a restart.
+ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+SETTINGS_CHECK_INTERVAL = float(os.getenv("SETTINGS_CHECK_INTERVAL", "2") or 2)  # seconds between stat() calls
+_settings = None  # (values, .env mtime_ns, monotonic time of last check)
+_settings_lock = threading.Lock()
+
+
+def _env_stamp():
+    """(inode, mtime, size) of .env: changes on every write, including atomic replaces."""
+    try:
+        st = os.stat(ENV_PATH)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _load_settings(stamp):
+    values = dict(_PROCESS_ENV)
+    if stamp is not None:
+        values.update({k: v for k, v in dotenv_values(ENV_PATH).items() if v is not None})
+    return MappingProxyType(values)
+
+
+def current_settings():
+    """The current settings snapshot (read-only mapping); cheap enough to call per request."""
+    global _settings
+    snapshot = _settings
+    now = time.monotonic()
+    if snapshot is not None and now - snapshot[2] < SETTINGS_CHECK_INTERVAL:
+        return snapshot[0]
+    with _settings_lock:
+        snapshot = _settings
+        if snapshot is None or now - snapshot[2] >= SETTINGS_CHECK_INTERVAL:
+            stamp = _env_stamp()
+            if snapshot is None or stamp != snapshot[1]:
+                values = _load_settings(stamp)
+                if snapshot is not None:
+                    app.logger.info(f"Settings reloaded from .env (version {values.get(SETTINGS_VERSION_KEY, 0)})")
+            else:
+                values = snapshot[0]
+            snapshot = _settings = (values, stamp, now)
+    return snapshot[0]
+
+
+def reload_settings():
+    """Rebuild the snapshot now (after this process wrote .env)."""
+    global _settings
+    with _settings_lock:
+        stamp = _env_stamp()
+        _settings = (_load_settings(stamp), stamp, time.monotonic())
+    return _settings[0]
+
+
+def get_setting(key, default=None):
+    return current_settings().get(key, default)
+
+
+# .env is only ever written through update_env_file(): read-modify-write under an exclusive
+# lock (fcntl on POSIX, so it covers every worker process; per process elsewhere), then a
+# write to a temp file and an atomic rename, so readers never see a partial file. Each write
+# bumps SETTINGS_VERSION in the file, which lets a form detect that it is editing stale values.
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows
+    fcntl = None
+
+SETTINGS_VERSION_KEY = "SETTINGS_VERSION"
+_env_write_lock = threading.Lock()
+
+
+class SettingsConflict(Exception):
+    """.env was changed since the version the caller based its update on."""
+
+
+@contextmanager
+def env_file_lock():
+    with _env_write_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(ENV_PATH + ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def settings_version(settings=None):
+    try:
+        return int((settings or current_settings()).get(SETTINGS_VERSION_KEY) or 0)
+    except ValueError:
+        return 0
+
+
+def update_env_file(values, expected_version=None):
+    """Set `values` (key -> str) in .env atomically and return the new settings version.
+
+    Raises SettingsConflict if expected_version is given and .env is at another version.
+    """
+    with env_file_lock():
+        try:
+            with open(ENV_PATH, "r", encoding="utf-8") as fh:
+                lines = fh.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        version = settings_version(dotenv_values(stream=io.StringIO("\n".join(lines))))
+        if expected_version is not None and expected_version != version:
+            raise SettingsConflict(f".env is at version {version}, not {expected_version}")
+        values = dict(values, **{SETTINGS_VERSION_KEY: str(version + 1)})
+
+        out_lines, updated = [], set()
+        for line in lines:
+            key = line.strip().partition("=")[0].strip()
+            if key in values and not line.strip().startswith("#"):
+                out_lines.append(f"{key}={values[key]}")
+                updated.add(key)
+            else:
+                out_lines.append(line)
+        out_lines += [f"{key}={value}" for key, value in values.items() if key not in updated]
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ENV_PATH), prefix=".env.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write("\n".join(out_lines) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            try:
+                os.chmod(tmp, os.stat(ENV_PATH).st_mode & 0o777)
+            except FileNotFoundError:
+                pass  # new file keeps mkstemp's 0600
+            os.replace(tmp, ENV_PATH)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        reload_settings()
+    return version + 1
+
 
 # File uploads config
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
@@ -56,25 +232,955 @@ def allowed_attachment(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ATTACH_ALLOWED_EXTENSIONS
 
 
+# Whole-request cap, enforced by Werkzeug while the body streams in (413 past it), and a
+# per-attachment cap applied while the upload is copied to disk.
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "25") or 25)
+app.config["MAX_CONTENT_LENGTH"] = int(MAX_UPLOAD_MB * 1024 * 1024)
+ATTACHMENT_MAX_BYTES = app.config["ATTACHMENT_MAX_BYTES"] = min(
+    int(float(os.getenv("ATTACHMENT_MAX_MB", "20") or 20) * 1024 * 1024), app.config["MAX_CONTENT_LENGTH"]
+)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def save_upload(file, path, max_bytes=None, digest=None):
+    """Copy an uploaded file to disk in chunks; raises UploadTooLarge (leaving no file) past max_bytes.
+
+    `digest` (a hashlib object) is fed the content on the way through.
+    """
+    max_bytes = max_bytes or ATTACHMENT_MAX_BYTES
+    written = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"{file.filename} is larger than {max_bytes // (1024 * 1024)} MB")
+                if digest is not None:
+                    digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+# Uploads are stored content-addressed as <sha256><ext>: the same file uploaded for several
+# services/employees/tasks is kept once, and its URL changes whenever its content does.
+CONTENT_ADDRESSED_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def store_upload(file, max_bytes=None):
+    """Save an upload under its SHA-256 and register it in media; returns the stored filename."""
+    upload_dir = os.path.join(app.static_folder, UPLOAD_SUBDIR)
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    fd, tmp = tempfile.mkstemp(dir=upload_dir, prefix=".upload-")
+    os.close(fd)
+    digest = hashlib.sha256()
+    size = save_upload(file, tmp, max_bytes, digest)
+    filename = f"{digest.hexdigest()}{ext}"
+    path = os.path.join(upload_dir, filename)
+    if os.path.exists(path):
+        os.remove(tmp)
+        os.utime(path)  # fresh mtime keeps the garbage collector's grace period honest
+    else:
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    register_media(filename, digest.hexdigest(), size)
+    return filename
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    message = f"Upload too large (limit {MAX_UPLOAD_MB:g} MB)."
+    if request.path.startswith("/admin"):
+        flash(message, "danger")
+        return redirect(request.path)
+    return message, 413
+
+
+# ---------------------- Image variants ----------------------
+# Raster uploads get resized copies (thumb/card/full, WebP + JPEG, metadata stripped) under
+# static/uploads/variants/, plus a small JSON sidecar with their widths for srcset. Needs
+# Pillow (listed in requirements.txt); without it templates simply serve the original file.
+try:
+    from PIL import Image, ImageOps  # type: ignore
+except Exception:
+    Image = ImageOps = None
+PILLOW_MISSING = "Pillow is not installed, so image variants cannot be generated (pip install -r requirements.txt)."
+
+IMAGE_VARIANTS = {"thumb": 160, "card": 480, "full": 1280}  # max width in px
+IMAGE_VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+RESIZABLE_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}  # gif is left alone to keep animations
+VARIANTS_SUBDIR = f"{UPLOAD_SUBDIR}/variants"
+os.makedirs(os.path.join(app.static_folder, VARIANTS_SUBDIR), exist_ok=True)
+_image_variants_cache = {}
+
+
+def is_resizable_image(filename):
+    return bool(filename) and "." in filename and filename.rsplit(".", 1)[1].lower() in RESIZABLE_EXTENSIONS
+
+
+def variant_path(filename, variant, fmt):
+    """Static-relative path of one variant of an upload."""
+    return f"{VARIANTS_SUBDIR}/{os.path.splitext(filename)[0]}-{variant}.{fmt}"
+
+
+def _sidecar_path(filename):
+    return os.path.join(app.static_folder, VARIANTS_SUBDIR, os.path.splitext(filename)[0] + ".json")
+
+
+def _atomic_save(image, path, pil_format, options):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp, pil_format, **options)
+    os.replace(tmp, path)
+
+
+def generate_image_variants(filename):
+    """Write all variants of an upload; returns {variant: width}, or {} if it cannot be resized."""
+    if Image is None or not is_resizable_image(filename):
+        return {}
+    src = os.path.join(app.static_folder, UPLOAD_SUBDIR, filename)
+    widths = {}
+    largest = max(IMAGE_VARIANTS.values())
+    with Image.open(src) as original:
+        # JPEG can decode straight at 1/2..1/8 scale, far cheaper than decoding full size
+        original.draft("RGB", (largest, largest))
+        # Apply EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+        # Largest first, each variant resized from the previous one
+        for variant, max_width in sorted(IMAGE_VARIANTS.items(), key=lambda kv: -kv[1]):
+            width = min(max_width, image.width)
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image.copy()
+            resized.info = {}  # no EXIF / ICC / text chunks in the output
+            image = resized
+            for fmt, (pil_format, options) in IMAGE_VARIANT_FORMATS.items():
+                out = resized
+                if pil_format == "JPEG" and resized.mode == "RGBA":
+                    out = Image.new("RGB", resized.size, (255, 255, 255))
+                    out.paste(resized, mask=resized.getchannel("A"))
+                _atomic_save(out, os.path.join(app.static_folder, variant_path(filename, variant, fmt)), pil_format, options)
+            widths[variant] = width
+    tmp = _sidecar_path(filename) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(widths, f)
+    os.replace(tmp, _sidecar_path(filename))
+    _image_variants_cache[filename] = widths
+    return widths
+
+
+def register_media(filename, sha256=None, size=None):
+    """Record an upload in media. Raster images start 'pending' for the media worker, which
+    writes their variants; pages serve the original until then. A re-upload of known content
+    only refreshes updated_at."""
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        now = datetime.utcnow()
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO media (filename, sha256, size_bytes, status, created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE updated_at=VALUES(updated_at)",
+                (filename, sha256, size, "pending" if is_resizable_image(filename) else "ready", now, now),
+            )
+            conn.commit()
+    except Error as e:
+        app.logger.error(f"Media register error for {filename}: {e}")
+    finally:
+        conn.close()
+
+
+@app.cli.command("images-rebuild")
+@click.option("--missing-only", is_flag=True, help="Skip uploads that already have variants.")
+def images_rebuild_command(missing_only):
+    """Generate image variants for every raster file in static/uploads."""
+    if Image is None:
+        raise SystemExit(PILLOW_MISSING)
+    upload_dir = os.path.join(app.static_folder, UPLOAD_SUBDIR)
+    done = 0
+    for name in sorted(os.listdir(upload_dir)):
+        if not is_resizable_image(name) or (missing_only and os.path.exists(_sidecar_path(name))):
+            continue
+        try:
+            widths = generate_image_variants(name)
+        except Exception as e:
+            print(f"FAIL {name}: {e}")
+            continue
+        done += 1
+        print(f"OK   {name}: {widths}")
+    print(f"{done} image(s) processed.")
+
+
+@app.template_global()
+def image_variants(filename):
+    """srcset data for an upload, or None until its variants exist."""
+    if not is_resizable_image(filename):
+        return None
+    widths = _image_variants_cache.get(filename)
+    if widths is None:
+        try:
+            with open(_sidecar_path(filename), encoding="utf-8") as f:
+                widths = json.load(f)
+        except (OSError, ValueError):
+            return None
+        _image_variants_cache[filename] = widths
+    srcset = {}
+    for fmt in IMAGE_VARIANT_FORMATS:
+        seen, parts = set(), []
+        for variant, width in sorted(widths.items(), key=lambda kv: kv[1]):
+            if width not in seen:
+                seen.add(width)
+                parts.append(f"{url_for('static', filename=variant_path(filename, variant, fmt))} {width}w")
+        srcset[fmt] = ", ".join(parts)
+    return {
+        "srcset": srcset,
+        "src": url_for("static", filename=variant_path(filename, "card" if "card" in widths else next(iter(widths)), "jpg")),
+        "thumb": url_for("static", filename=variant_path(filename, "thumb", "webp")) if "thumb" in widths else None,
+    }
+
+
+# ---------------------- Media worker ----------------------
+# `flask --app app media-worker` generates variants off-request: it claims pending media rows
+# and fans them out to a process pool (one process per core by default), so uploads return
+# immediately and resizing uses every core. It also sweeps static/uploads for files that
+# were never registered (older uploads, files copied in by hand).
+MEDIA_WORKER_PROCESSES = int(os.getenv("MEDIA_WORKER_PROCESSES", "0") or 0) or os.cpu_count() or 1
+MEDIA_CLAIM_BATCH = int(os.getenv("MEDIA_CLAIM_BATCH", "0") or 0) or MEDIA_WORKER_PROCESSES * 4
+MEDIA_MAX_ATTEMPTS = int(os.getenv("MEDIA_MAX_ATTEMPTS", "3") or 3)
+MEDIA_LOCK_TIMEOUT = int(os.getenv("MEDIA_LOCK_TIMEOUT", "600") or 600)  # reclaim rows of a dead worker
+MEDIA_POLL_INTERVAL = float(os.getenv("MEDIA_POLL_INTERVAL", "2") or 2)  # seconds, when idle
+MEDIA_SCAN_INTERVAL = float(os.getenv("MEDIA_SCAN_INTERVAL", "300") or 300)  # seconds between upload sweeps
+
+
+def register_unprocessed_uploads(conn):
+    """Insert pending media rows for raster uploads that have no variants and no row yet."""
+    upload_dir = os.path.join(app.static_folder, UPLOAD_SUBDIR)
+    names = [n for n in os.listdir(upload_dir) if is_resizable_image(n) and not os.path.exists(_sidecar_path(n))]
+    if not names:
+        return 0
+    now = datetime.utcnow()
+    with conn.cursor() as cur:
+        cur.executemany(
+            "INSERT IGNORE INTO media (filename, status, created_at, updated_at) VALUES (%s, 'pending', %s, %s)",
+            [(n, now, now) for n in names],
+        )
+        added = cur.rowcount
+    conn.commit()
+    return added
+
+
+def claim_media(conn, limit=MEDIA_CLAIM_BATCH):
+    now = datetime.utcnow()
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute(
+            "UPDATE media SET status='pending', locked_at=NULL, updated_at=%s WHERE status='processing' AND locked_at < %s",
+            (now, now - timedelta(seconds=MEDIA_LOCK_TIMEOUT)),
+        )
+        cur.execute(
+            "SELECT id, filename, attempts FROM media WHERE status='pending' ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED",
+            (limit,),
+        )
+        rows = cur.fetchall()
+        if rows:
+            ids = [r["id"] for r in rows]
+            cur.execute(
+                f"UPDATE media SET status='processing', locked_at=%s, updated_at=%s WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                (now, now, *ids),
+            )
+    conn.commit()
+    return rows
+
+
+def process_media_batch(conn, pool, limit=MEDIA_CLAIM_BATCH):
+    """Generate variants for one claimed batch in the pool; returns the number of rows processed."""
+    rows = claim_media(conn, limit)
+    if not rows:
+        return 0
+    started = time.monotonic()
+    futures = {pool.submit(generate_image_variants, row["filename"]): row for row in rows}
+    ready = 0
+    for future in as_completed(futures):
+        row = futures[future]
+        now = datetime.utcnow()
+        try:
+            widths = future.result()
+            if not widths:
+                raise ValueError("not a resizable image")
+        except Exception as e:
+            attempts = row["attempts"] + 1
+            app.logger.error(f"media-worker: variants for {row['filename']} failed: {e}")
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE media SET status=%s, attempts=%s, last_error=%s, locked_at=NULL, updated_at=%s WHERE id=%s",
+                    (
+                        "failed" if attempts >= MEDIA_MAX_ATTEMPTS else "pending",
+                        attempts,
+                        f"{type(e).__name__}: {e}"[:500],
+                        now,
+                        row["id"],
+                    ),
+                )
+        else:
+            ready += 1
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE media SET status='ready', variants=%s, attempts=attempts+1, last_error=NULL, locked_at=NULL, "
+                    "processed_at=%s, updated_at=%s WHERE id=%s",
+                    (json.dumps(widths), now, now, row["id"]),
+                )
+        conn.commit()
+    # Pages embedding these images change (original -> srcset), so their ETags must too
+    invalidate_cache("media")
+    app.logger.info(f"media-worker: {ready}/{len(rows)} image(s) ready in {time.monotonic() - started:.2f}s")
+    return len(rows)
+
+
+@app.cli.command("media-worker")
+@click.option("--once", is_flag=True, help="Process whatever is pending now, then exit.")
+@click.option("--processes", type=int, default=None, help="Pool size (default: MEDIA_WORKER_PROCESSES or CPU count).")
+def media_worker_command(once, processes):
+    """Generate image variants for uploaded files until interrupted."""
+    if Image is None:
+        raise SystemExit(PILLOW_MISSING)
+    processes = processes or MEDIA_WORKER_PROCESSES
+    app.logger.setLevel(logging.INFO)
+    print(f"media-worker started with {processes} process(es).")
+    last_scan = None
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        try:
+            while True:
+                # A fresh app context per batch so the teardown hook returns the connection
+                with app.app_context():
+                    processed = 0
+                    try:
+                        with db_connection() as conn:
+                            if conn:
+                                if last_scan is None or time.monotonic() - last_scan >= MEDIA_SCAN_INTERVAL:
+                                    last_scan = time.monotonic()
+                                    register_unprocessed_uploads(conn)
+                                processed = process_media_batch(conn, pool, max(MEDIA_CLAIM_BATCH, processes))
+                            else:
+                                app.logger.error("media-worker: database not available")
+                    except Error as e:
+                        app.logger.error(f"media-worker error: {e}")
+                if once and not processed:
+                    break
+                if not processed:
+                    time.sleep(MEDIA_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+    print("media-worker stopped.")
+
+
+# Unreferenced uploads are kept for MEDIA_GC_GRACE seconds: a file is stored before the row
+# that uses it is saved, and WhatsApp links point at message attachments no table references.
+MEDIA_GC_GRACE = int(os.getenv("MEDIA_GC_GRACE", str(7 * 86400)) or 7 * 86400)
+
+
+def recount_media_refs(conn):
+    """Recompute media.ref_count from services / employees / tasks (the triggers keep it current)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE media m SET ref_count = "
+            "(SELECT COUNT(*) FROM services s WHERE s.image_filename = m.filename) "
+            "+ (SELECT COUNT(*) FROM employees e WHERE e.photo_filename = m.filename) "
+            "+ (SELECT COUNT(*) FROM tasks t WHERE t.attachment_filename = m.filename)"
+        )
+    conn.commit()
+
+
+def remove_media_files(filename):
+    original = os.path.join(app.static_folder, UPLOAD_SUBDIR, filename)
+    paths = [original, _sidecar_path(filename)] + [original + suffix for suffix in PRECOMPRESSED_SUFFIXES]
+    paths += [
+        os.path.join(app.static_folder, variant_path(filename, variant, fmt))
+        for variant in IMAGE_VARIANTS
+        for fmt in IMAGE_VARIANT_FORMATS
+    ]
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    _image_variants_cache.pop(filename, None)
+
+
+def collect_media_garbage(conn, dry_run=False):
+    """Delete content-addressed uploads nothing has referenced for MEDIA_GC_GRACE seconds.
+
+    Returns [(filename, size_bytes)] of what was (or, with dry_run, would be) removed.
+    """
+    recount_media_refs(conn)
+    cutoff = datetime.utcnow() - timedelta(seconds=MEDIA_GC_GRACE)
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute(
+            "SELECT id, filename, size_bytes FROM media m WHERE ref_count <= 0 AND updated_at < %s "
+            "AND NOT EXISTS (SELECT 1 FROM outbound_emails o WHERE o.attachment_filename = m.filename)",
+            (cutoff,),
+        )
+        candidates = cur.fetchall()
+    removed = []
+    for row in candidates:
+        filename = row["filename"]
+        if not CONTENT_ADDRESSED_RE.match(filename):
+            continue  # files from before content addressing may be referenced by templates
+        path = os.path.join(app.static_folder, UPLOAD_SUBDIR, filename)
+        if os.path.exists(path) and datetime.utcfromtimestamp(os.path.getmtime(path)) >= cutoff:
+            continue  # re-uploaded since the row was last touched
+        if not dry_run:
+            with conn.cursor() as cur:
+                # Re-check under the delete so a reference added meanwhile wins
+                cur.execute("DELETE FROM media WHERE id=%s AND ref_count <= 0 AND updated_at < %s", (row["id"], cutoff))
+                deleted = cur.rowcount == 1
+            conn.commit()
+            if not deleted:
+                continue
+            remove_media_files(filename)
+        removed.append((filename, row["size_bytes"] or 0))
+    return removed
+
+
+@app.cli.command("media-gc")
+@click.option("--dry-run", is_flag=True, help="List what would be removed without deleting anything.")
+def media_gc_command(dry_run):
+    """Delete uploaded files (and their variants) that no service, employee or task uses."""
+    with db_connection() as conn:
+        if not conn:
+            raise SystemExit("Database not available.")
+        removed = collect_media_garbage(conn, dry_run)
+    for filename, size in removed:
+        print(f"{'would remove' if dry_run else 'removed'} {filename} ({size} bytes)")
+    print(f"{len(removed)} file(s), {sum(size for _, size in removed)} bytes {'reclaimable' if dry_run else 'reclaimed'}.")
+
+
+# ---------------------- Database connection pool ----------------------
+# One pool per worker process; sized via env so it can be tuned per deployment.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5") or 5)
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10") or 0)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5") or 5)  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800") or 0)  # max connection lifetime (0 = unlimited)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() != "false"
+
+
+class PooledConnection:
+    """Proxy around a pooled MySQL connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise Error("Connection already returned to the pool")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._checkin(raw, self._created_at)
+
+    def invalidate(self):
+        """Close the connection instead of returning it, e.g. when its session state is unknown."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._discard(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Small thread-safe MySQL connection pool with overflow, pre-ping and max lifetime."""
+
+    def __init__(self, config, size=5, max_overflow=10, timeout=5.0, recycle=1800, pre_ping=True):
+        self.config = dict(config)
+        self.size = max(1, size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.pid = os.getpid()
+        self._idle = deque()  # (raw, created_at); LIFO so hot connections are reused first
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "connect_errors": 0,
+            "peak_in_use": 0,
+        }
+
+    def _connect(self):
+        try:
+            raw = mysql.connector.connect(**self.config)
+        except Error:
+            with self._cond:
+                self._open -= 1
+                self._stats["connect_errors"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return raw, time.monotonic()
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _is_usable(self, raw, created_at):
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            with self._cond:
+                self._stats["recycled"] += 1
+            return False
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats["ping_failures"] += 1
+                return False
+        return True
+
+    def checkout(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                record = None
+                if self._idle:
+                    record = self._idle.pop()
+                elif self._open < self.size + self.max_overflow:
+                    self._open += 1
+                else:
+                    self._stats["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if not self._idle and self._open >= self.size + self.max_overflow:
+                            self._stats["timeouts"] += 1
+                            raise Error(f"Connection pool exhausted (size={self.size}, overflow={self.max_overflow})")
+                    continue
+            if record is None:
+                raw, created_at = self._connect()
+            else:
+                raw, created_at = record
+                if not self._is_usable(raw, created_at):
+                    self._discard(raw)
+                    continue
+            with self._cond:
+                self._stats["checkouts"] += 1
+                in_use = self._open - len(self._idle)
+                self._stats["peak_in_use"] = max(self._stats["peak_in_use"], in_use)
+            return PooledConnection(self, raw, created_at)
+
+    def _checkin(self, raw, created_at):
+        try:
+            # Never hand a half-finished transaction to the next borrower
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            if len(self._idle) < self.size:
+                self._idle.append((raw, created_at))
+                self._cond.notify()
+                return
+        # Overflow connection: close instead of keeping it idle
+        self._discard(raw)
+
+    def dispose(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update(
+                {
+                    "pid": self.pid,
+                    "size": self.size,
+                    "max_overflow": self.max_overflow,
+                    "open": self._open,
+                    "idle": len(self._idle),
+                    "in_use": self._open - len(self._idle),
+                }
+            )
+        return data
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """Return this worker's pool, creating a fresh one after a fork."""
+    global _db_pool
+    pool = _db_pool
+    if pool is None or pool.pid != os.getpid():
+        with _db_pool_lock:
+            if _db_pool is None or _db_pool.pid != os.getpid():
+                # Connections inherited from a parent process are not ours to reuse or close
+                _db_pool = ConnectionPool(
+                    DB_CONFIG,
+                    size=DB_POOL_SIZE,
+                    max_overflow=DB_POOL_MAX_OVERFLOW,
+                    timeout=DB_POOL_TIMEOUT,
+                    recycle=DB_POOL_RECYCLE,
+                    pre_ping=DB_POOL_PRE_PING,
+                )
+            pool = _db_pool
+    return pool
+
+
 def get_db_connection():
+    """Borrow a pooled connection (None if unavailable). close() returns it to the pool."""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
+        conn = get_db_pool().checkout()
     except Error as e:
         app.logger.error(f"MySQL connection error: {e}")
         return None
+    if has_app_context():
+        # Safety net: anything a view forgets to close is released at teardown
+        g.setdefault("_db_conns", []).append(conn)
+    return conn
+
+
+@contextmanager
+def db_connection():
+    """Context manager around get_db_connection(); yields None if the DB is unavailable."""
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        if conn:
+            conn.close()
+
+
+@app.teardown_appcontext
+def release_db_connections(exc):
+    for conn in g.pop("_db_conns", []):
+        conn.close()
+
+
+# ---------------------- Vendored front-end assets ----------------------
+# Bootstrap (CSS + JS bundle with Popper) and Chart.js are served from static/vendor/, so
+# pages load nothing from a CDN and work on intranets without internet access. Icons are
+# built from the Bootstrap Icons sprite in assets/: `flask assets-icons` writes CSS for only
+# the bi-* classes the templates use, drawn as masks, so no icon font is downloaded.
+ICON_SPRITE = os.path.join(app.root_path, "assets", "bootstrap-icons.svg")
+ICON_CSS = os.path.join(app.static_folder, "vendor", "bootstrap-icons", "bootstrap-icons.css")
+ICON_CLASS_RE = re.compile(r"(?<![\w-])bi-([a-z0-9]+(?:-[a-z0-9]+)*)")
+ICON_SYMBOL_RE = re.compile(r'<symbol\b[^>]*?viewBox="([^"]+)"[^>]*?id="([^"]+)"[^>]*>(.*?)</symbol>', re.S)
+
+
+def used_icon_names():
+    """bi-* names referenced by the templates and app.py."""
+    sources = [os.path.join(app.root_path, "app.py")]
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        sources += [os.path.join(root, fname) for fname in files]
+    names = set()
+    for path in sources:
+        with open(path, encoding="utf-8") as fh:
+            names.update(ICON_CLASS_RE.findall(fh.read()))
+    return names
+
+
+def build_icon_css(names):
+    """Return (css, missing) for the given icon names from the sprite."""
+    with open(ICON_SPRITE, encoding="utf-8") as fh:
+        symbols = {name: (viewbox, body) for viewbox, name, body in ICON_SYMBOL_RE.findall(fh.read())}
+    found = sorted(n for n in names if n in symbols)
+    rules = []
+    for name in found:
+        viewbox, body = symbols[name]
+        svg = f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='{viewbox}'>{body.replace(chr(34), chr(39))}</svg>"
+        uri = "data:image/svg+xml," + quote(svg, safe=" /=:,.-'")
+        rules.append(f'.bi-{name}{{--bi-icon:url("{uri}")}}')
+    selector = ",".join(f".bi-{name}::before" for name in found)
+    css = (
+        "/*! Bootstrap Icons (https://icons.getbootstrap.com/), MIT License. "
+        "Generated by `flask assets-icons`; do not edit. */\n"
+        f"{selector}{{content:\"\";display:inline-block;width:1em;height:1em;vertical-align:-.125em;"
+        "background-color:currentColor;-webkit-mask:var(--bi-icon) center/contain no-repeat;"
+        "mask:var(--bi-icon) center/contain no-repeat}\n" + "\n".join(rules) + "\n"
+    )
+    return css, sorted(set(names) - set(found))
+
+
+@app.cli.command("assets-icons")
+def assets_icons_command():
+    """Regenerate static/vendor/bootstrap-icons/bootstrap-icons.css for the icons in use."""
+    css, missing = build_icon_css(used_icon_names())
+    os.makedirs(os.path.dirname(ICON_CSS), exist_ok=True)
+    tmp = ICON_CSS + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(css)
+    os.replace(tmp, ICON_CSS)
+    for name in missing:
+        print(f"warning: bi-{name} is not in {os.path.basename(ICON_SPRITE)}")
+    print(f"Wrote {os.path.relpath(ICON_CSS, app.root_path)} ({len(css)} bytes).")
+
+
+# ---------------------- Static asset fingerprinting ----------------------
+# url_for("static", filename="css/styles.css") renders as css/styles.<hash>.css, the hash
+# taken from the file's contents, so those URLs are cached for a year and a deploy that
+# changes a file changes its URL. The manifest is built at startup; uploads are left out
+# (new ones are content-addressed already). With debug on, edited files are re-hashed.
+ASSET_HASH_LENGTH = 12
+_asset_manifest = {}  # "css/styles.css" -> ("css/styles.<hash>.css", mtime)
+_asset_files = {}  # "css/styles.<hash>.css" -> "css/styles.css"
+
+
+def _fingerprint_asset(filename):
+    path = os.path.join(app.static_folder, filename)
+    mtime = os.path.getmtime(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    root, ext = os.path.splitext(filename)
+    hashed = f"{root}.{digest.hexdigest()[:ASSET_HASH_LENGTH]}{ext}"
+    previous = _asset_manifest.get(filename)
+    if previous:
+        _asset_files.pop(previous[0], None)
+    _asset_manifest[filename] = (hashed, mtime)
+    _asset_files[hashed] = filename
+    return hashed
+
+
+def build_asset_manifest():
+    _asset_manifest.clear()
+    _asset_files.clear()
+    for root, dirs, files in os.walk(app.static_folder):
+        if root == app.static_folder and UPLOAD_SUBDIR in dirs:
+            dirs.remove(UPLOAD_SUBDIR)
+        for fname in files:
+            if fname.endswith(PRECOMPRESSED_SUFFIXES):
+                continue
+            rel = os.path.relpath(os.path.join(root, fname), app.static_folder).replace(os.sep, "/")
+            _fingerprint_asset(rel)
+
+
+def assets_version():
+    """Short digest of the current manifest, for validators of pages that link the assets."""
+    return hashlib.sha1("".join(sorted(h for h, _ in _asset_manifest.values())).encode("utf-8")).hexdigest()[:12]
+
+
+# ---------------------- Precompressed static files ----------------------
+# `flask assets-compress` (run at deploy) writes .br and .gz siblings of compressible static
+# files; the static view serves the best one the client accepts, so no CPU is spent
+# compressing assets per request. Brotli needs `pip install brotli`; gzip always works.
+try:
+    import brotli  # type: ignore
+except Exception:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".json", ".map", ".txt", ".xml", ".ttf", ".eot"}
+ASSET_COMPRESS_MIN_BYTES = 512  # smaller files are not worth a second request header
+# (Content-Encoding token, file suffix), in order of preference
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+PRECOMPRESSED_SUFFIXES = tuple(suffix for _, suffix in PRECOMPRESSED_ENCODINGS)
+_precompressed = {}  # "css/styles.css" -> {"br": "css/styles.css.br", "gzip": "css/styles.css.gz"}
+
+
+def _compressible_assets():
+    """Yield static paths (relative, "/"-separated) worth precompressing; skips image variants."""
+    variants_dir = os.path.join(app.static_folder, VARIANTS_SUBDIR)
+    for root, dirs, files in os.walk(app.static_folder):
+        if os.path.abspath(root) == os.path.abspath(variants_dir):
+            dirs[:] = []
+            continue
+        for fname in files:
+            if os.path.splitext(fname)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                yield os.path.relpath(os.path.join(root, fname), app.static_folder).replace(os.sep, "/")
+
+
+def scan_precompressed():
+    """Record which static files have up-to-date compressed siblings on disk."""
+    _precompressed.clear()
+    for rel in _compressible_assets():
+        path = os.path.join(app.static_folder, rel)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        found = {}
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            try:
+                if os.path.getmtime(path + suffix) >= mtime:
+                    found[encoding] = rel + suffix
+            except OSError:
+                pass
+        if found:
+            _precompressed[rel] = found
+
+
+def precompress_asset(rel, force=False):
+    """Write .br/.gz siblings of one static file; returns the encodings written."""
+    path = os.path.join(app.static_folder, rel)
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if len(data) < ASSET_COMPRESS_MIN_BYTES:
+        return []
+    written = []
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        target = path + suffix
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+            continue
+        if encoding == "br":
+            if brotli is None:
+                continue
+            body = brotli.compress(data, quality=11)
+        else:
+            body = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(body) >= len(data):
+            continue
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(body)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        written.append(encoding)
+    return written
+
+
+@app.cli.command("assets-compress")
+@click.option("--force", is_flag=True, help="Recompress files whose .br/.gz are already up to date.")
+def assets_compress_command(force):
+    """Precompress static css/js/svg files into .br and .gz siblings (run at deploy)."""
+    if brotli is None:
+        print("brotli is not installed; writing .gz only (pip install brotli for .br).")
+    count = 0
+    for rel in _compressible_assets():
+        written = precompress_asset(rel, force)
+        if written:
+            count += 1
+            print(f"{rel}: {', '.join(written)}")
+    print(f"{count} file(s) compressed.")
+
+
+build_asset_manifest()
+scan_precompressed()
+
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint != "static":
+        return
+    filename = values.get("filename")
+    entry = _asset_manifest.get(filename)
+    if not entry:
+        return
+    if app.debug:
+        try:
+            if os.path.getmtime(os.path.join(app.static_folder, filename)) != entry[1]:
+                values["filename"] = _fingerprint_asset(filename)
+                return
+        except OSError:
+            return
+    values["filename"] = entry[0]
+
+
+_send_static_file = app.view_functions["static"]
+
+
+def static_asset(filename):
+    """Serve /static/, mapping fingerprinted names back to the file on disk.
+
+    Files with precompressed siblings are served as .br/.gz when the client accepts it.
+    """
+    filename = _asset_files.get(filename, filename)
+    variants = _precompressed.get(filename)
+    if not variants:
+        return _send_static_file(filename=filename)
+    for encoding, _ in PRECOMPRESSED_ENCODINGS:
+        if encoding in variants and request.accept_encodings.quality(encoding) > 0:
+            resp = send_from_directory(
+                app.static_folder,
+                variants[encoding],
+                mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                max_age=app.get_send_file_max_age(filename),
+            )
+            resp.headers["Content-Encoding"] = encoding
+            break
+    else:
+        resp = _send_static_file(filename=filename)
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+app.view_functions["static"] = static_asset
+
+
+# Cache-Control per endpoint; anything not listed is not cached. Public pages vary with the
+# session (nav, flash messages), so they are private and revalidated via ETag each time.
+# Override one with CACHE_POLICY_<ENDPOINT>, e.g. CACHE_POLICY_SERVICES="private, max-age=60".
+CACHE_POLICIES = {
+    "home": "private, no-cache",
+    "about": "private, no-cache",
+    "services": "private, no-cache",
+    "projects": "private, no-cache",
+}
+CACHE_POLICIES.update(
+    {k[len("CACHE_POLICY_"):].lower(): v for k, v in os.environ.items() if k.startswith("CACHE_POLICY_") and v}
+)
 
 
 @app.after_request
 def add_headers(resp):
     """Add caching headers for static assets and security tweaks."""
     try:
-        # Cache static assets longer; dynamic routes short/no cache
+        # Cache static assets longer; dynamic routes per CACHE_POLICIES
         if request.path.startswith("/static/"):
-            resp.headers["Cache-Control"] = "public, max-age=604800, immutable"  # 7 days
+            filename = (request.view_args or {}).get("filename", "")
+            if filename in _asset_files or CONTENT_ADDRESSED_RE.match(os.path.basename(filename)):
+                # Named by content hash: the URL changes whenever the bytes do
+                resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"  # 1 year
+            elif filename.startswith(UPLOAD_SUBDIR + "/"):
+                resp.headers["Cache-Control"] = "public, max-age=604800, immutable"  # 7 days
+            else:
+                # Plain URL of a fingerprinted asset (hand-written link, old page): keep it fresh
+                resp.headers["Cache-Control"] = "public, max-age=300"
         else:
-            # Avoid caching dynamic HTML
-            resp.headers.setdefault("Cache-Control", "no-store")
+            # Avoid caching dynamic HTML unless the endpoint has a policy
+            resp.headers.setdefault("Cache-Control", CACHE_POLICIES.get(request.endpoint, "no-store"))
         # Security headers (lightweight)
         resp.headers.setdefault("X-Content-Type-Options", "nosniff")
         resp.headers.setdefault("Referrer-Policy", "strict-origin-when-cross-origin")
@@ -83,115 +1189,685 @@ def add_headers(resp):
     return resp
 
 
-def ensure_task_time_logs_table(conn):
-    """Create task_time_logs table if it does not exist."""
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS task_time_logs (
-                  id INT UNSIGNED NOT NULL AUTO_INCREMENT,
-                  employee_id INT UNSIGNED NOT NULL,
-                  task_id INT UNSIGNED NOT NULL,
-                  action ENUM('start','complete') NOT NULL,
-                  at DATETIME NOT NULL,
-                  PRIMARY KEY (id),
-                  INDEX (employee_id),
-                  INDEX (task_id),
-                  INDEX (action),
-                  CONSTRAINT fk_ttl_task FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE,
-                  CONSTRAINT fk_ttl_emp FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """
-            )
-        conn.commit()
-    except Error as e:
-        app.logger.error(f"ensure_task_time_logs_table error: {e}")
+# ---------------------- Schema migrations ----------------------
+# Versioned SQL files in migrations/ (NNNN_name.sql), applied once at startup or
+# deploy (`flask --app app db-upgrade`) and recorded in schema_migrations, so
+# request handlers never issue DDL.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# MySQL errors meaning "this change is already in place" (e.g. DB created from schema.sql)
+MIGRATION_IDEMPOTENT_ERRNOS = {
+    1050,  # table already exists
+    1060,  # duplicate column name
+    1061,  # duplicate key name
+    1091,  # can't drop; column/key doesn't exist
+    1359,  # trigger already exists
+    1826,  # duplicate foreign key constraint name
+}
 
 
-def ensure_auth_logs_table(conn):
-    """Create auth_logs table if it does not exist."""
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Return [(version, name, [statements])] sorted by version."""
+    migrations = []
+    if not os.path.isdir(directory):
+        return migrations
+    for fname in sorted(os.listdir(directory)):
+        m = re.match(r"^(\d+)_(\w+)\.sql$", fname)
+        if not m:
+            continue
+        with open(os.path.join(directory, fname), "r", encoding="utf-8") as f:
+            sql = "\n".join(line for line in f.read().splitlines() if not line.lstrip().startswith("--"))
+        statements = [stmt.strip() for stmt in re.split(r";\s*(?:\n|$)", sql) if stmt.strip()]
+        migrations.append((int(m.group(1)), m.group(2), statements))
+    return migrations
+
+
+def run_migrations(conn=None):
+    """Apply pending migrations under a named lock. Returns the list of versions applied."""
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    if not conn:
+        return []
+    applied_now = []
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS auth_logs (
-                  id INT UNSIGNED NOT NULL AUTO_INCREMENT,
-                  username VARCHAR(100) NULL,
-                  user_id INT UNSIGNED NULL,
-                  is_admin TINYINT(1) NOT NULL DEFAULT 0,
-                  action ENUM('login_success','login_failure','logout') NOT NULL,
-                  ip VARCHAR(45) NULL,
-                  user_agent VARCHAR(255) NULL,
-                  device_type VARCHAR(20) NULL,
-                  at DATETIME NOT NULL,
-                  PRIMARY KEY (id),
-                  INDEX (username),
-                  INDEX (user_id),
-                  INDEX (is_admin),
-                  INDEX (action),
-                  INDEX (at)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """
-            )
-            # Attempt to add device_type if table existed previously without it
+        with conn.cursor(buffered=True) as cur:
+            cur.execute("SELECT GET_LOCK('schema_migrations', 60)")
+            (locked,) = cur.fetchone()
+            if not locked:
+                raise Error("Timed out waiting for schema_migrations lock")
             try:
                 cur.execute(
                     """
-                    SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
-                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'auth_logs' AND COLUMN_NAME = 'device_type'
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                      version INT UNSIGNED NOT NULL,
+                      name VARCHAR(190) NOT NULL,
+                      applied_at DATETIME NOT NULL,
+                      PRIMARY KEY (version)
+                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
                     """
                 )
-                exists = cur.fetchone()
-                if not exists:
-                    cur.execute("ALTER TABLE auth_logs ADD COLUMN device_type VARCHAR(20) NULL AFTER user_agent")
-            except Exception:
-                pass
-        conn.commit()
+                cur.execute("SELECT version FROM schema_migrations")
+                done = {row[0] for row in cur.fetchall()}
+                for version, name, statements in load_migrations():
+                    if version in done:
+                        continue
+                    for stmt in statements:
+                        try:
+                            cur.execute(stmt)
+                        except Error as e:
+                            if getattr(e, "errno", None) not in MIGRATION_IDEMPOTENT_ERRNOS:
+                                raise
+                            app.logger.info(f"Migration {version:04d}_{name}: already applied ({e.msg})")
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+                        (version, name, datetime.utcnow()),
+                    )
+                    conn.commit()
+                    applied_now.append(version)
+                    app.logger.info(f"Applied migration {version:04d}_{name}")
+            finally:
+                cur.execute("SELECT RELEASE_LOCK('schema_migrations')")
     except Error as e:
-        app.logger.error(f"ensure_auth_logs_table error: {e}")
+        app.logger.error(f"run_migrations error: {e}")
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+    return applied_now
+
+
+@app.cli.command("db-upgrade")
+def db_upgrade_command():
+    """Apply pending schema migrations."""
+    applied = run_migrations()
+    print(f"Applied: {', '.join(f'{v:04d}' for v in applied)}" if applied else "Schema is up to date.")
+
+
+def _detect_device_type(ua: str) -> str:
+    """Very simple user-agent based device classifier."""
+    if not ua:
+        return "unknown"
+    s = ua.lower()
+    if "mobi" in s or "android" in s or "iphone" in s or "ipad" in s:
+        return "mobile"
+    return "desktop"
+
+
+# ---------------------- Audit log write-behind queue ----------------------
+# auth_logs / admin_actions rows are buffered in memory and written in batches by a
+# background thread so request latency does not depend on audit-log writes.
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000") or 10000)
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200") or 200)
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0") or 1.0)  # seconds
+AUDIT_MAX_RETRIES = int(os.getenv("AUDIT_MAX_RETRIES", "3") or 3)
+AUDIT_DRAIN_TIMEOUT = float(os.getenv("AUDIT_DRAIN_TIMEOUT", "5") or 5)  # seconds, on shutdown
+# When the queue is full: drop_newest (default), drop_oldest, or block (up to AUDIT_BLOCK_TIMEOUT)
+AUDIT_OVERFLOW_POLICY = os.getenv("AUDIT_OVERFLOW_POLICY", "drop_newest").lower()
+AUDIT_BLOCK_TIMEOUT = float(os.getenv("AUDIT_BLOCK_TIMEOUT", "0.1") or 0.1)
+
+AUDIT_TABLE_COLUMNS = {
+    "auth_logs": ("username", "user_id", "is_admin", "action", "ip", "user_agent", "device_type", "at"),
+    "admin_actions": (
+        "actor", "target_user_id", "device_id", "tool", "action", "status", "notes", "metadata", "started_at", "ended_at",
+    ),
+}
+
+
+class AuditLogWriter:
+    """Bounded in-memory queue drained by a daemon thread with multi-row INSERTs."""
+
+    def __init__(self, maxsize, batch_size, flush_interval, overflow_policy="drop_newest"):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed_batches": 0}
+        self._thread.start()
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def submit(self, table, row):
+        item = (table, row)
+        try:
+            if self.overflow_policy == "block":
+                self.queue.put(item, timeout=AUDIT_BLOCK_TIMEOUT)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            if self.overflow_policy == "drop_oldest":
+                try:
+                    self.queue.get_nowait()
+                    self._count("dropped")
+                    self.queue.put_nowait(item)
+                except (queue.Empty, queue.Full):
+                    self._count("dropped")
+                    return False
+            else:
+                self._count("dropped")
+                return False
+        self._count("enqueued")
+        return True
+
+    def _collect(self):
+        """Block for the first item, then gather until the batch is full or the interval elapses."""
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        by_table = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+        for attempt in range(1, AUDIT_MAX_RETRIES + 1):
+            conn = get_db_connection()
+            if conn:
+                try:
+                    with conn.cursor() as cur:
+                        for table, rows in by_table.items():
+                            cols = AUDIT_TABLE_COLUMNS[table]
+                            # executemany() on a plain INSERT is sent as one multi-row INSERT
+                            cur.executemany(
+                                f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})",
+                                [tuple(r.get(c) for c in cols) for r in rows],
+                            )
+                    conn.commit()
+                    self._count("written", len(batch))
+                    if "admin_actions" in by_table:
+                        invalidate_cache("admin_actions")
+                    return
+                except Error as e:
+                    app.logger.error(f"Audit log flush error (attempt {attempt}): {e}")
+                finally:
+                    conn.close()
+            if self._stop.is_set():
+                break
+            time.sleep(min(2 ** attempt * 0.1, 2.0))
+        self._count("failed_batches")
+        self._count("dropped", len(batch))
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def drain(self, timeout=AUDIT_DRAIN_TIMEOUT):
+        """Flush what is queued and stop the writer (called at interpreter exit)."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            data = dict(self._stats)
+        data.update({"pid": self.pid, "queued": self.queue.qsize(), "max": self.queue.maxsize, "policy": self.overflow_policy})
+        return data
+
+
+_audit_writer = None
+_audit_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """Return this worker's writer, starting a fresh thread after a fork."""
+    global _audit_writer
+    writer = _audit_writer
+    if writer is None or writer.pid != os.getpid():
+        with _audit_writer_lock:
+            if _audit_writer is None or _audit_writer.pid != os.getpid():
+                _audit_writer = AuditLogWriter(
+                    AUDIT_QUEUE_MAX, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL, AUDIT_OVERFLOW_POLICY
+                )
+            writer = _audit_writer
+    return writer
+
+
+@atexit.register
+def _drain_audit_writer():
+    if _audit_writer is not None and _audit_writer.pid == os.getpid():
+        _audit_writer.drain()
+
+
+def log_auth_event(action: str, username: str = None, user_id: int = None, is_admin: bool = False):
+    """Queue an auth event for auth_logs (request details are captured now, written later)."""
+    ua = request.user_agent.string if request and request.user_agent else None
+    get_audit_writer().submit(
+        "auth_logs",
+        {
+            "username": username,
+            "user_id": user_id,
+            "is_admin": 1 if is_admin else 0,
+            "action": action,
+            "ip": client_ip() if request else None,
+            "user_agent": (ua[:255] if ua else None),
+            "device_type": _detect_device_type(ua),
+            "at": datetime.utcnow(),
+        },
+    )
+
+
+# ---------------------- Cache layer ----------------------
+# Pluggable backend shared by the public pages and the admin dashboard:
+#   lru   - in-process LRU (default; one copy per worker)
+#   file  - pickle files under CACHE_DIR, shared by all workers on the host
+#   redis - any Redis-protocol server at CACHE_URL (needs the optional `redis` package)
+# Keys are namespaced by CACHE_PREFIX and by a generation counter per tag (table name);
+# invalidating a tag bumps its counter in the backend, so with a shared backend every
+# worker stops seeing the old entries at once.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "lru").lower()
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "vk")
+CACHE_URL = os.getenv("CACHE_URL", "redis://127.0.0.1:6379/0")
+# Entries are unpickled, so the directory must belong to us alone (never a shared temp dir)
+CACHE_DIR = os.getenv("CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CACHE_LRU_SIZE = int(os.getenv("CACHE_LRU_SIZE", "1024") or 1024)
+CACHE_DIR_MAX_ENTRIES = int(os.getenv("CACHE_DIR_MAX_ENTRIES", "10000") or 0)  # file backend; 0 = no cap
+CACHE_DIR_PRUNE_EVERY = int(os.getenv("CACHE_DIR_PRUNE_EVERY", "500") or 0)  # ~1 prune per N sets; 0 = CLI only
+PUBLIC_CACHE_TTL = int(os.getenv("PUBLIC_CACHE_TTL", "300") or 0)  # seconds; 0 disables
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "30") or 0)
+
+try:
+    import redis  # type: ignore
+except Exception:
+    redis = None
+
+
+class LRUCacheBackend:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = max(1, maxsize)
+        self._data = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def get_many(self, keys):
+        return [self.get(k) for k in keys]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.time() + ttl if ttl else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            value = int(entry[1]) + 1 if entry else 1
+            self._data[key] = (None, value)
+            return value
+
+
+class FileCacheBackend:
+    """Pickle-per-key cache in a directory shared by every worker on the host.
+
+    Writes go to a temp file and are renamed into place, so readers never see a partial
+    entry; incr() is serialized across processes with flock where available. Expired entries
+    are removed when read and by prune(), which set() runs on a random sample of calls.
+    """
+
+    TMP_MAX_AGE = 3600  # leftovers of writers that died between mkstemp and rename
+
+    def __init__(self, directory, max_entries=CACHE_DIR_MAX_ENTRIES, prune_every=CACHE_DIR_PRUNE_EVERY):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._check_private(directory)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _check_private(directory):
+        """Refuse a directory others could plant files in: get() unpickles them, i.e. runs their code."""
+        if not hasattr(os, "getuid"):
+            return  # no POSIX ownership to check (Windows)
+        st = os.stat(directory)
+        if st.st_uid != os.getuid():
+            raise RuntimeError(f"cache directory {directory} is owned by uid {st.st_uid}, not {os.getuid()}")
+        if st.st_mode & 0o022:
+            raise RuntimeError(f"cache directory {directory} is group/world-writable (mode {st.st_mode & 0o777:o})")
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".cache")
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            expires_at, value = self._read(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            self._unlink(path)
+            return None
+        return value
+
+    def get_many(self, keys):
+        return [self.get(k) for k in keys]
+
+    def set(self, key, value, ttl=None):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((time.time() + ttl if ttl else None, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            self._unlink(tmp)
+        if self.prune_every > 0 and random.randrange(self.prune_every) == 0:
+            try:
+                self.prune()
+            except OSError as e:
+                app.logger.warning(f"Cache prune error: {e}")
+
+    def prune(self):
+        """Delete expired entries and stale temp files, then the oldest expiring entries beyond
+        max_entries. Entries without expiry (tag generation counters) are never evicted: losing
+        one would resurrect entries cached under an older generation. Returns the files removed."""
+        now = time.time()
+        removed = 0
+        expiring = []  # (mtime, path) of live entries that carry a TTL
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    if mtime < now - self.TMP_MAX_AGE:
+                        removed += self._unlink(entry.path)
+                    continue
+                if not entry.name.endswith(".cache"):
+                    continue
+                try:
+                    expires_at, _ = self._read(entry.path)
+                except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+                    removed += self._unlink(entry.path)
+                    continue
+                if expires_at is None:
+                    continue
+                if expires_at <= now:
+                    removed += self._unlink(entry.path)
+                else:
+                    expiring.append((mtime, entry.path))
+        if self.max_entries > 0 and len(expiring) > self.max_entries:
+            expiring.sort()
+            for _, path in expiring[: len(expiring) - self.max_entries]:
+                removed += self._unlink(path)
+        return removed
+
+    def delete(self, key):
+        self._unlink(self._path(key))
+
+    def incr(self, key):
+        with self._lock, open(os.path.join(self.directory, ".lock"), "a") as lockf:
+            if fcntl:
+                fcntl.flock(lockf, fcntl.LOCK_EX)
+            try:
+                value = int(self.get(key) or 0) + 1
+                self.set(key, value)
+                return value
+            finally:
+                if fcntl:
+                    fcntl.flock(lockf, fcntl.LOCK_UN)
+
+
+class RedisCacheBackend:
+    """Redis-protocol backend; pass `client` to use an existing (or fake) client."""
+
+    def __init__(self, url=None, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+
+    @staticmethod
+    def _load(raw):
+        if raw is None:
+            return None
+        try:
+            return pickle.loads(raw)
+        except Exception:
+            # Counters written by INCR are stored as plain integers
+            return int(raw)
+
+    def get(self, key):
+        return self._load(self.client.get(key))
+
+    def get_many(self, keys):
+        return [self._load(raw) for raw in self.client.mget(keys)] if keys else []
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+
+class Cache:
+    """Namespaced, tag-invalidated front end over a cache backend.
+
+    Backend errors are logged and treated as misses so a cache outage only costs speed.
+    """
+
+    def __init__(self, backend, prefix):
+        self.backend = backend
+        self.prefix = prefix
+
+    def _gen_key(self, tag):
+        return f"{self.prefix}:gen:{tag}"
+
+    def _key(self, name, tags):
+        gens = self.backend.get_many([self._gen_key(t) for t in tags]) if tags else []
+        stamp = ".".join(str(int(g or 0)) for g in gens)
+        return f"{self.prefix}:{name}:{stamp}"
+
+    def get(self, name, tags=()):
+        try:
+            return self.backend.get(self._key(name, tags))
+        except Exception as e:
+            app.logger.warning(f"Cache get error for {name}: {e}")
+            return None
+
+    def set(self, name, value, ttl, tags=()):
+        try:
+            self.backend.set(self._key(name, tags), value, ttl)
+        except Exception as e:
+            app.logger.warning(f"Cache set error for {name}: {e}")
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            try:
+                self.backend.incr(self._gen_key(tag))
+            except Exception as e:
+                app.logger.warning(f"Cache invalidate error for {tag}: {e}")
+
+
+def create_cache_backend(kind=CACHE_BACKEND):
+    try:
+        if kind == "redis":
+            return RedisCacheBackend(CACHE_URL)
+        if kind == "file":
+            return FileCacheBackend(CACHE_DIR)
+    except Exception as e:
+        app.logger.warning(f"Cache backend '{kind}' unavailable ({e}); using in-process LRU")
+    return LRUCacheBackend(CACHE_LRU_SIZE)
+
+
+cache = Cache(create_cache_backend(), CACHE_PREFIX)
+
+
+@app.cli.command("cache-prune")
+def cache_prune_command():
+    """Remove expired and surplus entries from the file cache (CACHE_BACKEND=file)."""
+    if not isinstance(cache.backend, FileCacheBackend):
+        print(f"CACHE_BACKEND={CACHE_BACKEND} expires entries itself; nothing to prune.")
+        return
+    print(f"{cache.backend.prune()} file(s) removed from {cache.backend.directory}.")
+
+
+def cached(name, tags, loader, ttl):
+    """Return loader() through the cache. A None result (e.g. DB down) is not cached."""
+    if ttl > 0:
+        value = cache.get(name, tags)
+        if value is not None:
+            return value
+    value = loader()
+    if value is not None and ttl > 0:
+        cache.set(name, value, ttl, tags)
+    return value
+
+
+def cached_query(key, tags, sql, params=(), ttl=None):
+    """fetchall() of a dictionary query, served from the cache when fresh ([] on DB error)."""
+
+    def load():
+        conn = get_db_connection()
+        if not conn:
+            return None
+        try:
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(sql, params)
+                return cur.fetchall() or []
+        except Error as e:
+            app.logger.error(f"{key} fetch error: {e}")
+            return None
+        finally:
+            conn.close()
+
+    rows = cached(key, tags, load, PUBLIC_CACHE_TTL if ttl is None else ttl)
+    return rows if rows is not None else []
+
+
+def invalidate_cache(*tags):
+    """Invalidate cached results that read any of the given tables, in every worker."""
+    cache.invalidate(*tags)
+
+
+# ---------------------- Conditional responses (ETag / Last-Modified) ----------------------
+def _templates_version():
+    """Digest of the templates, so a deploy that changes markup changes every ETag."""
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        for fname in sorted(files):
+            path = os.path.join(root, fname)
+            digest.update(path.encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+TEMPLATES_VERSION = _templates_version()
+
+
+def table_version(table):
+    """(MAX(updated_at), COUNT(*)) for a table, cached and invalidated with the table's tag.
+
+    The row count catches deletes, which do not move MAX(updated_at).
+    """
+
+    def load():
+        conn = get_db_connection()
+        if not conn:
+            return None
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT MAX(updated_at), COUNT(*) FROM {table}")
+                last, count = cur.fetchone()
+                return (last, int(count or 0))
+        except Error as e:
+            app.logger.error(f"table_version({table}) error: {e}")
+            return None
+        finally:
+            conn.close()
+
+    return cached(f"version:{table}", (table,), load, PUBLIC_CACHE_TTL)
 
 
-def _detect_device_type(ua: str) -> str:
-    """Very simple user-agent based device classifier."""
-    if not ua:
-        return "unknown"
-    s = ua.lower()
-    if "mobi" in s or "android" in s or "iphone" in s or "ipad" in s:
-        return "mobile"
-    return "desktop"
+def conditional_page(*tables, extra=None):
+    """Answer If-None-Match / If-Modified-Since with 304 before the view renders.
 
+    The ETag covers the data version of `tables`, the templates, the static asset
+    fingerprints, what the layout shows for this session, and `extra()` for any other
+    inputs of the page.
+    """
 
-def log_auth_event(action: str, username: str = None, user_id: int = None, is_admin: bool = False):
-    """Insert an auth event into auth_logs."""
-    conn = get_db_connection()
-    if not conn:
-        return
-    ensure_auth_logs_table(conn)
-    try:
-        with conn.cursor() as cur:
-            ua = request.user_agent.string if request and request.user_agent else None
-            cur.execute(
-                """
-                INSERT INTO auth_logs (username, user_id, is_admin, action, ip, user_agent, device_type, at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    username,
-                    user_id,
-                    1 if is_admin else 0,
-                    action,
-                    request.headers.get("X-Forwarded-For", request.remote_addr) if request else None,
-                    (ua[:255] if ua else None),
-                    _detect_device_type(ua),
-                    datetime.utcnow(),
-                ),
-            )
-            conn.commit()
-    except Error as e:
-        app.logger.error(f"log_auth_event error: {e}")
-    finally:
-        conn.close()
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are one-off content; never serve them from a validator
+            if session.get("_flashes"):
+                return view_func(*args, **kwargs)
+            versions = [table_version(t) for t in tables]
+            if any(v is None for v in versions):
+                return view_func(*args, **kwargs)
+            viewer = (bool(session.get("admin_logged_in")), session.get("user_id"))
+            seed = repr((request.full_path, versions, TEMPLATES_VERSION, assets_version(), viewer, extra() if extra else None))
+            etag = hashlib.sha1(seed.encode("utf-8")).hexdigest()
+            stamps = [v[0] for v in versions if v[0] is not None]
+            last_modified = max(stamps).replace(microsecond=0, tzinfo=timezone.utc) if stamps else None
+
+            not_modified = False
+            if request.if_none_match:
+                # Weak comparison (RFC 9110): proxies that compress the body send back W/"..."
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified and viewer == (False, None):
+                not_modified = last_modified <= request.if_modified_since
+            if not_modified:
+                resp = app.response_class(status=304)
+            else:
+                resp = make_response(view_func(*args, **kwargs))
+            resp.set_etag(etag)
+            if last_modified:
+                resp.last_modified = last_modified
+            return resp
+
+        return wrapper
+
+    return decorator
 
 
 def admin_required(view_func):
@@ -217,82 +1893,65 @@ def employee_required(view_func):
     return wrapper
 
 
+def _home_stats():
+    # Dynamic homepage stats (override via .env)
+    years = int(get_setting("STATS_YEARS", "8") or 8)
+    projects = int(get_setting("STATS_PROJECTS", "120") or 120)
+    uptime = get_setting("STATS_UPTIME", "99.95%") or "99.95%"
+    support = get_setting("STATS_SUPPORT", "24/7") or "24/7"
+    return {"years": years, "projects": projects, "uptime": uptime, "support": support}
+
+
 @app.route("/")
+@conditional_page("services", "media", extra=_home_stats)
 def home():
-    # Dynamic homepage stats (override via .env)
-    years = int(os.getenv("STATS_YEARS", "8") or 8)
-    projects = int(os.getenv("STATS_PROJECTS", "120") or 120)
-    uptime = os.getenv("STATS_UPTIME", "99.95%") or "99.95%"
-    support = os.getenv("STATS_SUPPORT", "24/7") or "24/7"
-    stats = {"years": years, "projects": projects, "uptime": uptime, "support": support}
+    stats = _home_stats()
     # Fetch a few featured services for the homepage hero
-    featured_services = []
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor(dictionary=True) as cur:
-                cur.execute(
-                    """
-                    SELECT id, title, description, image_filename
-                    FROM services
-                    WHERE is_active=1
-                    ORDER BY featured DESC, sort_order ASC, created_at DESC
-                    LIMIT 3
-                    """
-                )
-                featured_services = cur.fetchall()
-        except Error as e:
-            app.logger.error(f"Home featured services fetch error: {e}")
-        finally:
-            conn.close()
+    featured_services = cached_query(
+        "home:featured_services",
+        ("services",),
+        """
+        SELECT id, title, description, image_filename
+        FROM services
+        WHERE is_active=1
+        ORDER BY featured DESC, sort_order ASC, created_at DESC
+        LIMIT 3
+        """,
+    )
     return render_template("index.html", stats=stats, featured_services=featured_services)
 
 
 @app.route("/about")
+@conditional_page("employees", "media")
 def about():
     # Show active employees on the about page
-    conn = get_db_connection()
-    employees = []
-    if conn:
-        try:
-            with conn.cursor(dictionary=True) as cur:
-                cur.execute(
-                    """
-                    SELECT id, name, position, photo_filename
-                    FROM employees
-                    WHERE is_active=1
-                    ORDER BY sort_order ASC, created_at DESC
-                    """
-                )
-                employees = cur.fetchall()
-        except Error as e:
-            app.logger.error(f"Employees fetch error: {e}")
-        finally:
-            conn.close()
+    employees = cached_query(
+        "about:employees",
+        ("employees",),
+        """
+        SELECT id, name, position, photo_filename
+        FROM employees
+        WHERE is_active=1
+        ORDER BY sort_order ASC, created_at DESC
+        """,
+    )
     return render_template("about.html", employees=employees)
 
 
 @app.route("/services")
+@conditional_page("services", "media")
 def services():
     # Public services view: fetch active services
-    conn = get_db_connection()
-    items = []
-    if conn:
-        try:
-            with conn.cursor(dictionary=True) as cur:
-                cur.execute(
-                    """
-                    SELECT id, title, description, image_filename, featured, sort_order
-                    FROM services
-                    WHERE is_active=1
-                    ORDER BY featured DESC, sort_order ASC, created_at DESC
-                    """
-                )
-                items = cur.fetchall()
-        except Error as e:
-            app.logger.error(f"Services fetch error: {e}")
-        finally:
-            conn.close()
+    items = cached_query(
+        "services:active",
+        ("services",),
+        """
+        SELECT id, title, description, image_filename, featured, sort_order
+        FROM services
+        WHERE is_active=1
+        ORDER BY featured DESC, sort_order ASC, created_at DESC
+        """,
+    )
     return render_template("services.html", services=items)
 
 
@@ -322,6 +1981,7 @@ def contact():
                     (name, email, message, datetime.utcnow()),
                 )
                 conn.commit()
+                invalidate_cache("contacts")
             flash("Thank you! Your message has been sent.", "success")
             return redirect(url_for("contact"))
         except Error as e:
@@ -333,6 +1993,279 @@ def contact():
     return render_template("contact.html")
 
 
+# ---------------------- Password hashing ----------------------
+# Password hashes are checked on a small dedicated thread pool (hashlib releases the GIL
+# while hashing, so the threads really run in parallel) and at most PASSWORD_HASH_QUEUE
+# checks may wait for it. Beyond that a sign-in is refused at once, so a burst of logins or
+# a credential-stuffing run cannot tie up every request thread with CPU-bound hashing.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt") or "scrypt"  # e.g. "scrypt:32768:8:1", "pbkdf2:sha256:600000"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2") or 2)
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "8") or 0)  # checks allowed to wait for a worker
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "5") or 5)  # seconds a sign-in waits for its check
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60") or 0)  # seconds; login user rows, 0 disables
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+
+class PasswordHashOverloaded(Exception):
+    """The hashing pool is saturated; the caller should ask the user to retry shortly."""
+
+
+def _get_hash_pool():
+    # Created on first use so forked workers (e.g. gunicorn --preload) each get their own threads
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                _hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+    return _hash_pool
+
+
+def run_password_job(fn, *args):
+    """Run fn(*args) on the hashing pool; raises PasswordHashOverloaded instead of queueing."""
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashOverloaded()
+    try:
+        future = _get_hash_pool().submit(fn, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    # The slot is held until the hash really finishes, even if this request gives up waiting
+    future.add_done_callback(lambda _: _hash_slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordHashOverloaded()
+
+
+def verify_password(pw_hash, password):
+    return run_password_job(check_password_hash, pw_hash, password)
+
+
+def hash_password(password):
+    return run_password_job(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+@lru_cache(maxsize=1)
+def _password_hash_prefix():
+    # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"); learn them from one hash
+    return generate_password_hash("", PASSWORD_HASH_METHOD).split("$", 1)[0]
+
+
+def password_needs_rehash(pw_hash):
+    """True if pw_hash was made with other parameters than PASSWORD_HASH_METHOD."""
+    return pw_hash.split("$", 1)[0] != _password_hash_prefix()
+
+
+def load_login_user(username):
+    """users row for sign-in, cached per username; None if unknown or the DB is down.
+
+    Unknown usernames are not cached, so probing random names cannot fill the cache
+    (the sign-in rate limiter bounds the queries they cost instead)."""
+
+    def load():
+        conn = get_db_connection()
+        if not conn:
+            return None
+        try:
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(
+                    "SELECT id, username, password_hash, role, is_active, employee_id FROM users WHERE username=%s",
+                    (username,),
+                )
+                return cur.fetchone()
+        except Error as e:
+            app.logger.error(f"Login fetch error: {e}")
+            return None
+        finally:
+            conn.close()
+
+    return cached(f"login_user:{username}", ("users",), load, USER_CACHE_TTL)
+
+
+def upgrade_password_hash(user, password):
+    """Re-hash a verified password with the current PASSWORD_HASH_METHOD (best effort)."""
+    try:
+        new_hash = hash_password(password)
+    except PasswordHashOverloaded:
+        return  # next login will try again
+    with db_connection() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE users SET password_hash=%s, updated_at=%s WHERE id=%s AND password_hash=%s",
+                    (new_hash, datetime.utcnow(), user["id"], user["password_hash"]),
+                )
+            conn.commit()
+        except Error as e:
+            app.logger.error(f"Password rehash error: {e}")
+            return
+    invalidate_cache("users")
+
+
+# ---------------------- Login rate limiting ----------------------
+# Every sign-in attempt takes a token from a bucket for its username and one for its client
+# IP before any credential check, hash or DB query; a successful sign-in gives them back, so
+# only failures count. Buckets hold LOGIN_MAX_FAILURES_* tokens and refill evenly over
+# LOGIN_RATE_WINDOW seconds, which behaves like a sliding window of that many failures.
+# Buckets live in each process, or in the cache backend (LOGIN_LIMIT_SHARED, on by default
+# with the file/redis backends) so all workers share them, and are seeded from recent
+# login_failure rows in auth_logs when a process handles its first sign-in.
+LOGIN_RATE_WINDOW = int(os.getenv("LOGIN_RATE_WINDOW", "900") or 900)  # seconds
+LOGIN_MAX_FAILURES_USER = int(os.getenv("LOGIN_MAX_FAILURES_USER", "10") or 10)
+LOGIN_MAX_FAILURES_IP = int(os.getenv("LOGIN_MAX_FAILURES_IP", "50") or 50)
+LOGIN_LIMIT_SHARED = (os.getenv("LOGIN_LIMIT_SHARED") or str(CACHE_BACKEND != "lru")).lower() not in ("false", "0")
+LOGIN_LIMIT_MAX_KEYS = 10000  # per-process buckets kept (least recently used are dropped)
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by string: `capacity` tokens, refilled over `window` seconds.
+
+    With `backend` (a cache backend) the state is shared between workers; updates there are
+    last-writer-wins, so simultaneous failures in different workers can be undercounted a
+    little. Backend errors let the attempt through rather than lock everyone out.
+    """
+
+    def __init__(self, name, capacity, window, backend=None, max_keys=LOGIN_LIMIT_MAX_KEYS):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.window = window
+        self.rate = self.capacity / float(window)
+        self.backend = backend
+        self.max_keys = max_keys
+        self._local = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def _backend_key(self, key):
+        return f"{CACHE_PREFIX}:ratelimit:{self.name}:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+    def _load(self, key):
+        if self.backend is not None:
+            return self.backend.get(self._backend_key(key))
+        return self._local.get(key)
+
+    def _store(self, key, tokens, now):
+        if self.backend is not None:
+            if tokens >= self.capacity:
+                self.backend.delete(self._backend_key(key))
+            else:
+                self.backend.set(self._backend_key(key), (tokens, now), self.window)
+            return
+        if tokens >= self.capacity:
+            self._local.pop(key, None)  # a full bucket needs no state
+            return
+        self._local[key] = (tokens, now)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_keys:
+            self._local.popitem(last=False)
+
+    def _tokens(self, key, now):
+        state = self._load(key)
+        if not state:
+            return float(self.capacity)
+        tokens, updated_at = state
+        return min(float(self.capacity), tokens + max(0.0, now - updated_at) * self.rate)
+
+    def take(self, key):
+        """Consume a token; returns 0 on success, else the seconds until one is available."""
+        now = time.time()
+        with self._lock:
+            try:
+                tokens = self._tokens(key, now)
+                if tokens < 1:
+                    return max(1, int((1 - tokens) / self.rate + 0.999))
+                self._store(key, tokens - 1, now)
+            except Exception as e:
+                app.logger.warning(f"Rate limiter {self.name} error: {e}")
+        return 0
+
+    def give(self, key):
+        now = time.time()
+        with self._lock:
+            try:
+                self._store(key, self._tokens(key, now) + 1, now)
+            except Exception as e:
+                app.logger.warning(f"Rate limiter {self.name} error: {e}")
+
+    def seed(self, key, failures):
+        """Start `key` with `failures` tokens spent, unless it already has state."""
+        now = time.time()
+        with self._lock:
+            try:
+                if not self._load(key):
+                    self._store(key, max(0.0, float(self.capacity - failures)), now)
+            except Exception as e:
+                app.logger.warning(f"Rate limiter {self.name} error: {e}")
+
+
+_limiter_backend = cache.backend if LOGIN_LIMIT_SHARED else None
+login_user_limiter = TokenBucketLimiter("login_user", LOGIN_MAX_FAILURES_USER, LOGIN_RATE_WINDOW, _limiter_backend)
+login_ip_limiter = TokenBucketLimiter("login_ip", LOGIN_MAX_FAILURES_IP, LOGIN_RATE_WINDOW, _limiter_backend)
+_login_limits_seeded = False
+_login_seed_lock = threading.Lock()
+
+
+def client_ip():
+    """Client address. X-Forwarded-For is only applied (by ProxyFix) with TRUSTED_PROXIES set,
+    so a client talking to the app directly cannot pick its own address."""
+    return request.remote_addr or ""
+
+
+def seed_login_limits():
+    """Load recent login_failure counts from auth_logs into the buckets, once per process."""
+    global _login_limits_seeded
+    if _login_limits_seeded:
+        return
+    with _login_seed_lock:
+        if _login_limits_seeded:
+            return
+        _login_limits_seeded = True
+        cutoff = datetime.utcnow() - timedelta(seconds=LOGIN_RATE_WINDOW)
+        with db_connection() as conn:
+            if not conn:
+                return
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT LOWER(username), COUNT(*) FROM auth_logs "
+                        "WHERE action='login_failure' AND at >= %s AND username IS NOT NULL GROUP BY LOWER(username)",
+                        (cutoff,),
+                    )
+                    for username, failures in cur.fetchall():
+                        login_user_limiter.seed(username, failures)
+                    cur.execute(
+                        "SELECT ip, COUNT(*) FROM auth_logs "
+                        "WHERE action='login_failure' AND at >= %s AND ip IS NOT NULL GROUP BY ip",
+                        (cutoff,),
+                    )
+                    for ip, failures in cur.fetchall():
+                        login_ip_limiter.seed(ip, failures)
+            except Error as e:
+                app.logger.error(f"Login limiter seed error: {e}")
+
+
+def take_login_attempt(username, ip):
+    """Reserve an attempt for (username, ip); returns 0, or seconds to wait if throttled."""
+    seed_login_limits()
+    wait = login_ip_limiter.take(ip)
+    if wait:
+        return wait
+    wait = login_user_limiter.take(username.lower())
+    if wait:
+        login_ip_limiter.give(ip)
+    return wait
+
+
+def release_login_attempt(username, ip):
+    """Give back an attempt that did not fail (successful sign-in, overload)."""
+    login_user_limiter.give(username.lower())
+    login_ip_limiter.give(ip)
+
+
 # ---------------------- User Auth (Employees) ----------------------
 @app.route("/register", methods=["GET", "POST"])
 def user_register():
@@ -347,45 +2280,49 @@ def user_register():
 def admin_users_new():
     conn = get_db_connection()
     employees = []
-    if conn:
-        try:
-            with conn.cursor(dictionary=True) as cur:
-                cur.execute("SELECT id, name FROM employees WHERE is_active=1 ORDER BY name ASC")
-                employees = cur.fetchall()
-        except Error as e:
-            app.logger.error(f"Employees fetch for user create error: {e}")
-        finally:
-            conn.close()
-    if request.method == "POST":
-        username = (request.form.get("username") or "").strip()
-        password = (request.form.get("password") or "").strip()
-        role = (request.form.get("role") or "employee").strip()
-        is_active = 1 if request.form.get("is_active") == "on" else 0
-        emp_raw = request.form.get("employee_id")
-        employee_id = int(emp_raw) if emp_raw and emp_raw.isdigit() else None
-        if not username or not password:
-            flash("Username and password are required.", "danger")
-            return render_template("admin/user_new.html", employees=employees)
-        pw_hash = generate_password_hash(password)
-        conn2 = get_db_connection()
-        if conn2:
+    try:
+        if conn:
             try:
-                with conn2.cursor() as cur:
-                    cur.execute(
-                        """
-                        INSERT INTO users (username, password_hash, role, is_active, employee_id, created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (username, pw_hash, role, is_active, employee_id, datetime.utcnow(), datetime.utcnow()),
-                    )
-                    conn2.commit()
-                flash("User created.", "success")
-                return redirect(url_for("admin_users_list"))
+                with conn.cursor(dictionary=True) as cur:
+                    cur.execute("SELECT id, name FROM employees WHERE is_active=1 ORDER BY name ASC")
+                    employees = cur.fetchall()
             except Error as e:
-                app.logger.error(f"User create error: {e}")
-                flash("Could not create user (username may be taken).", "danger")
-            finally:
-                conn2.close()
+                app.logger.error(f"Employees fetch for user create error: {e}")
+        if request.method == "POST":
+            username = (request.form.get("username") or "").strip()
+            password = (request.form.get("password") or "").strip()
+            role = (request.form.get("role") or "employee").strip()
+            is_active = 1 if request.form.get("is_active") == "on" else 0
+            emp_raw = request.form.get("employee_id")
+            employee_id = int(emp_raw) if emp_raw and emp_raw.isdigit() else None
+            if not username or not password:
+                flash("Username and password are required.", "danger")
+                return render_template("admin/user_new.html", employees=employees)
+            try:
+                pw_hash = hash_password(password)
+            except PasswordHashOverloaded:
+                flash("The server is busy; please try again in a moment.", "warning")
+                return render_template("admin/user_new.html", employees=employees)
+            if conn:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            """
+                            INSERT INTO users (username, password_hash, role, is_active, employee_id, created_at, updated_at)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            """,
+                            (username, pw_hash, role, is_active, employee_id, datetime.utcnow(), datetime.utcnow()),
+                        )
+                        conn.commit()
+                    invalidate_cache("users")
+                    flash("User created.", "success")
+                    return redirect(url_for("admin_users_list"))
+                except Error as e:
+                    app.logger.error(f"User create error: {e}")
+                    flash("Could not create user (username may be taken).", "danger")
+    finally:
+        if conn:
+            conn.close()
     return render_template("admin/user_new.html", employees=employees)
 
 
@@ -403,40 +2340,50 @@ def signin():
     if request.method == "POST":
         username = (request.form.get("username") or "").strip()
         password = (request.form.get("password") or "").strip()
+        ip = client_ip()
+
+        # Throttled attempts stop here, before any credential check, hash or DB query
+        wait = take_login_attempt(username, ip)
+        if wait:
+            flash(f"Too many failed sign-in attempts. Try again in {max(1, (wait + 59) // 60)} minute(s).", "danger")
+            resp = make_response(render_template("auth/signin.html", next_url=next_url), 429)
+            resp.headers["Retry-After"] = str(wait)
+            return resp
 
         # First: check if admin via environment credentials
-        load_dotenv(override=True)
-        env_user = os.getenv("ADMIN_USERNAME", "admin")
-        env_pass = os.getenv("ADMIN_PASSWORD", "admin")
-        if username == env_user and password == env_pass:
+        env_user = get_setting("ADMIN_USERNAME", "admin")
+        env_pass = get_setting("ADMIN_PASSWORD", "admin")
+        if hmac.compare_digest(username.encode(), env_user.encode()) and hmac.compare_digest(
+            password.encode(), env_pass.encode()
+        ):
+            release_login_attempt(username, ip)
             session.clear()
             session["admin_logged_in"] = True
             flash("Admin logged in.", "success")
             log_auth_event("login_success", username=username, user_id=None, is_admin=True)
             return redirect(next_url or url_for("admin_dashboard"))
 
-        # Else: check regular user in database
-        conn = get_db_connection()
-        user = None
-        if conn:
-            try:
-                with conn.cursor(dictionary=True) as cur:
-                    cur.execute(
-                        "SELECT id, username, password_hash, role, is_active, employee_id FROM users WHERE username=%s",
-                        (username,),
-                    )
-                    user = cur.fetchone()
-            except Error as e:
-                app.logger.error(f"Login fetch error: {e}")
-            finally:
-                conn.close()
-
-        if not user or not user.get("is_active") or not check_password_hash(user["password_hash"], password):
+        # Else: check regular user (cached row, then database)
+        user = load_login_user(username)
+        try:
+            valid = bool(user) and user.get("is_active") and verify_password(user["password_hash"], password)
+        except PasswordHashOverloaded:
+            release_login_attempt(username, ip)
+            app.logger.warning("Sign-in refused: password hashing pool is saturated")
+            flash("Too many sign-in attempts right now. Please try again in a moment.", "warning")
+            resp = make_response(render_template("auth/signin.html", next_url=next_url), 503)
+            resp.headers["Retry-After"] = "2"
+            return resp
+
+        if not valid:
             flash("Invalid credentials.", "danger")
             # log failure (do not reveal whether admin or user)
             log_auth_event("login_failure", username=username, user_id=None, is_admin=False)
             return redirect(url_for("signin", next=next_url))
 
+        release_login_attempt(username, ip)
+        if password_needs_rehash(user["password_hash"]):
+            upgrade_password_hash(user, password)
         session.clear()
         session["user_id"] = user["id"]
         session["user_role"] = user["role"]
@@ -466,6 +2413,28 @@ def user_logout():
 
 
 # ---------------------- Employee: My Tasks ----------------------
+# Task lists sort blocked, in_progress, todo, done; then by due date (undated last).
+# status_rank / due_sort are stored generated columns covered by the composite indexes
+# in migrations/0007, so both lists are index scans rather than filesorts.
+TASK_STATUS_RANK = {"blocked": 1, "in_progress": 2, "todo": 3, "done": 4}
+MY_TASKS_SQL = """
+    SELECT t.id, t.title, t.description, t.status, t.priority, t.due_date,
+           t.attachment_filename, t.github_url, t.updated_at
+    FROM tasks t
+    WHERE t.employee_id=%s
+    ORDER BY t.status_rank, t.due_sort, t.updated_at DESC, t.id DESC
+"""
+ADMIN_TASKS_SQL = """
+    SELECT t.id, t.title, t.description, t.status, t.priority, t.due_date, t.created_at, t.updated_at,
+           t.attachment_filename, t.github_url, t.status_rank, t.due_sort,
+           e.name AS employee_name, e.id AS employee_id
+    FROM tasks t
+    LEFT JOIN employees e ON e.id = t.employee_id
+    {where_clause}
+    ORDER BY t.status_rank, t.due_sort, t.created_at DESC, t.id DESC
+"""
+
+
 @app.route("/my/tasks")
 @employee_required
 def my_tasks():
@@ -478,17 +2447,7 @@ def my_tasks():
     if conn:
         try:
             with conn.cursor(dictionary=True) as cur:
-                cur.execute(
-                    """
-                    SELECT t.id, t.title, t.description, t.status, t.priority, t.due_date,
-                           t.attachment_filename, t.github_url, t.updated_at
-                    FROM tasks t
-                    WHERE t.employee_id=%s
-                    ORDER BY FIELD(t.status,'blocked','in_progress','todo','done'),
-                             t.due_date IS NULL, t.due_date ASC, t.updated_at DESC
-                    """,
-                    (emp_id,),
-                )
+                cur.execute(MY_TASKS_SQL, (emp_id,))
                 tasks = cur.fetchall()
         except Error as e:
             app.logger.error(f"My tasks fetch error: {e}")
@@ -533,33 +2492,56 @@ def my_task_detail(task_id):
 
 # ---------------------- Public: Completed Projects ----------------------
 @app.route("/projects")
+@conditional_page("tasks", "employees", "media")
 def projects():
     """Public page listing completed tasks as projects."""
-    rows = []
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor(dictionary=True) as cur:
-                cur.execute(
-                    """
-                    SELECT t.id, t.title, t.description, t.updated_at, t.github_url, t.attachment_filename,
-                           e.name AS employee_name
-                    FROM tasks t
-                    LEFT JOIN employees e ON e.id = t.employee_id
-                    WHERE t.status = %s
-                    ORDER BY t.updated_at DESC
-                    LIMIT 50
-                    """,
-                    ("done",),
-                )
-                rows = cur.fetchall() or []
-        except Error as e:
-            app.logger.error(f"Projects fetch error: {e}")
-        finally:
-            conn.close()
+    rows = cached_query(
+        "projects:done",
+        ("tasks", "employees"),
+        """
+        SELECT t.id, t.title, t.description, t.updated_at, t.github_url, t.attachment_filename,
+               e.name AS employee_name
+        FROM tasks t
+        LEFT JOIN employees e ON e.id = t.employee_id
+        WHERE t.status = %s
+        ORDER BY t.updated_at DESC
+        LIMIT 50
+        """,
+        ("done",),
+    )
     return render_template("projects.html", tasks=rows)
 
 
+@app.cli.command("explain-tasks")
+@click.option("--strict", is_flag=True, help="Exit non-zero if any task list query needs a filesort.")
+def explain_tasks_command(strict):
+    """EXPLAIN the task list queries and report whether they avoid a filesort."""
+    checks = [
+        ("my_tasks", MY_TASKS_SQL, (1,)),
+        ("admin_tasks_list", ADMIN_TASKS_SQL.format(where_clause=""), ()),
+        ("admin_tasks_list?status", ADMIN_TASKS_SQL.format(where_clause=" WHERE t.status_rank=%s"), (1,)),
+        ("admin_tasks_list?assignee", ADMIN_TASKS_SQL.format(where_clause=" WHERE t.employee_id=%s"), (1,)),
+    ]
+    failed = False
+    with db_connection() as conn:
+        if not conn:
+            raise SystemExit("Database not available.")
+        with conn.cursor(dictionary=True) as cur:
+            for name, sql, params in checks:
+                cur.execute("EXPLAIN " + sql, params)
+                plan = cur.fetchall()
+                driver = plan[0]
+                extra = " ".join((row.get("Extra") or "") for row in plan)
+                ok = driver.get("key") is not None and "filesort" not in extra
+                failed = failed or not ok
+                print(f"{'OK  ' if ok else 'FAIL'} {name}: key={driver.get('key')} rows={driver.get('rows')} extra={extra!r}")
+    if failed:
+        # On tiny tables the optimizer may prefer a scan + sort; treat as a warning unless strict
+        print("Some task list queries sort without an index (expected only on very small tables).")
+        if strict:
+            raise SystemExit(1)
+
+
 # ---- Employee: Task time logging (attendance-like) ----
 @app.route("/my/tasks/<int:task_id>/start", methods=["POST"])
 @employee_required
@@ -569,7 +2551,6 @@ def task_start(task_id):
     if not conn:
         flash("Database not available.", "danger")
         return redirect(url_for("my_task_detail", task_id=task_id))
-    ensure_task_time_logs_table(conn)
     try:
         with conn.cursor(dictionary=True) as cur:
             # Verify task belongs to employee
@@ -579,15 +2560,24 @@ def task_start(task_id):
                 flash("You don't have access to this task.", "danger")
                 return redirect(url_for("my_tasks"))
             # Log start and set status to in_progress
+            now = datetime.utcnow()
             cur.execute(
                 "INSERT INTO task_time_logs (employee_id, task_id, action, at) VALUES (%s,%s,%s,%s)",
-                (emp_id, task_id, "start", datetime.utcnow()),
+                (emp_id, task_id, "start", now),
+            )
+            cur.execute(
+                """
+                INSERT INTO task_activity_daily (employee_id, day, starts) VALUES (%s, %s, 1)
+                ON DUPLICATE KEY UPDATE starts = starts + 1
+                """,
+                (emp_id, now.date()),
             )
             cur.execute(
                 "UPDATE tasks SET status=%s, updated_at=%s WHERE id=%s",
                 ("in_progress", datetime.utcnow(), task_id),
             )
             conn.commit()
+            invalidate_cache("tasks")
         flash("Task started.", "success")
     except Error as e:
         app.logger.error(f"task_start error: {e}")
@@ -605,7 +2595,6 @@ def task_complete(task_id):
     if not conn:
         flash("Database not available.", "danger")
         return redirect(url_for("my_task_detail", task_id=task_id))
-    ensure_task_time_logs_table(conn)
     try:
         with conn.cursor(dictionary=True) as cur:
             cur.execute("SELECT id, employee_id FROM tasks WHERE id=%s", (task_id,))
@@ -614,15 +2603,24 @@ def task_complete(task_id):
                 flash("You don't have access to this task.", "danger")
                 return redirect(url_for("my_tasks"))
             # Log complete and set status to done
+            now = datetime.utcnow()
             cur.execute(
                 "INSERT INTO task_time_logs (employee_id, task_id, action, at) VALUES (%s,%s,%s,%s)",
-                (emp_id, task_id, "complete", datetime.utcnow()),
+                (emp_id, task_id, "complete", now),
+            )
+            cur.execute(
+                """
+                INSERT INTO task_activity_daily (employee_id, day, completes) VALUES (%s, %s, 1)
+                ON DUPLICATE KEY UPDATE completes = completes + 1
+                """,
+                (emp_id, now.date()),
             )
             cur.execute(
                 "UPDATE tasks SET status=%s, updated_at=%s WHERE id=%s",
                 ("done", datetime.utcnow(), task_id),
             )
             conn.commit()
+            invalidate_cache("tasks")
         flash("Task completed.", "success")
     except Error as e:
         app.logger.error(f"task_complete error: {e}")
@@ -632,41 +2630,45 @@ def task_complete(task_id):
     return redirect(url_for("my_task_detail", task_id=task_id))
 
 
+ACTIVITY_RANGES = (7, 30, 90, 365)
+
+
 @app.route("/my/activity.json")
 @employee_required
 def my_activity_json():
+    """Daily start/complete counts for the last ?days= (7, 30, 90 or 365) days."""
     emp_id = session.get("employee_id")
+    days = request.args.get("days", type=int) or 7
+    if days not in ACTIVITY_RANGES:
+        days = 7
     conn = get_db_connection()
     if not conn:
         return jsonify({"error": "db_unavailable"}), 503
-    ensure_task_time_logs_table(conn)
-    start_day = datetime.utcnow().date() - timedelta(days=6)
-    labels = []
-    for i in range(7):
-        d = start_day + timedelta(days=i)
-        labels.append(d.strftime("%Y-%m-%d"))
+    start_day = datetime.utcnow().date() - timedelta(days=days - 1)
+    labels = [(start_day + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
     data = {d: {"start": 0, "complete": 0} for d in labels}
     try:
         with conn.cursor(dictionary=True) as cur:
+            # Primary-key range scan over the rollup: at most `days` rows
             cur.execute(
                 """
-                SELECT DATE(at) AS d, action, COUNT(*) AS c
-                FROM task_time_logs
-                WHERE employee_id=%s AND at >= %s
-                GROUP BY DATE(at), action
-                ORDER BY DATE(at)
+                SELECT day, starts, completes
+                FROM task_activity_daily
+                WHERE employee_id=%s AND day >= %s
+                ORDER BY day
                 """,
                 (emp_id, start_day),
             )
             for row in cur.fetchall():
-                key = row["d"].strftime("%Y-%m-%d")
-                if key in data and row["action"] in ("start", "complete"):
-                    data[key][row["action"]] = int(row["c"]) or 0
+                key = row["day"].strftime("%Y-%m-%d")
+                if key in data:
+                    data[key] = {"start": int(row["starts"]), "complete": int(row["completes"])}
     except Error as e:
         app.logger.error(f"my_activity_json error: {e}")
     finally:
         conn.close()
     return jsonify({
+        "days": days,
         "labels": labels,
         "start": [data[d]["start"] for d in labels],
         "complete": [data[d]["complete"] for d in labels],
@@ -712,6 +2714,7 @@ def admin_users_edit(user_id):
                         (role, is_active, employee_id, datetime.utcnow(), user_id),
                     )
                     conn.commit()
+                invalidate_cache("users")
                 flash("User updated.", "success")
                 return redirect(url_for("admin_users_list"))
             except Error as e:
@@ -758,32 +2761,67 @@ def admin_logout():
 
 
 # ---------------------- Admin Dashboard ----------------------
+STAT_COUNTER_TABLES = {
+    "contacts": "contacts",
+    "services": "services",
+    "employees": "employees",
+    "tasks": "tasks",
+    "actions": "admin_actions",
+}
+
+
+def reconcile_stat_counters(conn):
+    """Recount every counter from its table (corrects any drift from bulk loads)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "REPLACE INTO stat_counters (name, value, updated_at, reconciled_at) "
+            + " UNION ALL ".join(
+                f"SELECT '{name}', COUNT(*), UTC_TIMESTAMP(), UTC_TIMESTAMP() FROM {table}"
+                for name, table in STAT_COUNTER_TABLES.items()
+            )
+        )
+    conn.commit()
+    invalidate_cache(*STAT_COUNTER_TABLES.values())
+
+
+@app.cli.command("stats-reconcile")
+def stats_reconcile_command():
+    """Recount the dashboard's stat_counters."""
+    with db_connection() as conn:
+        if not conn:
+            raise SystemExit("Database not available.")
+        reconcile_stat_counters(conn)
+    print("stat_counters reconciled.")
+
+
 @app.route("/admin")
 @admin_required
 def admin_dashboard():
-    stats = {"contacts": 0, "services": 0, "employees": 0, "tasks": 0, "actions": 0}
-    latest_contacts = []
-    latest_actions = []
-    conn = get_db_connection()
-    if conn:
+    def load():
+        data = {
+            "stats": dict.fromkeys(STAT_COUNTER_TABLES, 0),
+            "counted_at": None,
+            "reconciled_at": None,
+            "loaded_at": datetime.utcnow(),
+            "latest_contacts": [],
+            "latest_actions": [],
+        }
+        conn = get_db_connection()
+        if not conn:
+            return None
         try:
             with conn.cursor(dictionary=True) as cur:
-                cur.execute("SELECT COUNT(*) AS c FROM contacts")
-                stats["contacts"] = (cur.fetchone() or {}).get("c", 0)
-                cur.execute("SELECT COUNT(*) AS c FROM services")
-                stats["services"] = (cur.fetchone() or {}).get("c", 0)
-                cur.execute("SELECT COUNT(*) AS c FROM employees")
-                stats["employees"] = (cur.fetchone() or {}).get("c", 0)
-                cur.execute("SELECT COUNT(*) AS c FROM tasks")
-                stats["tasks"] = (cur.fetchone() or {}).get("c", 0)
+                # All stats in one round trip from the trigger-maintained counters
+                cur.execute("SELECT name, value, updated_at, reconciled_at FROM stat_counters")
+                for row in cur.fetchall():
+                    if row["name"] in data["stats"]:
+                        data["stats"][row["name"]] = int(row["value"])
+                        data["counted_at"] = max(filter(None, (data["counted_at"], row["updated_at"])))
+                        data["reconciled_at"] = min(filter(None, (data["reconciled_at"], row["reconciled_at"])))
                 cur.execute(
                     "SELECT id, name, email, message, created_at FROM contacts ORDER BY created_at DESC LIMIT 5"
                 )
-                latest_contacts = cur.fetchall()
-                # Admin actions summary and latest
-                ensure_admin_actions_table(conn)
-                cur.execute("SELECT COUNT(*) AS c FROM admin_actions")
-                stats["actions"] = (cur.fetchone() or {}).get("c", 0)
+                data["latest_contacts"] = cur.fetchall()
                 cur.execute(
                     """
                     SELECT id, actor, tool, action, status, device_id, started_at, ended_at
@@ -792,47 +2830,136 @@ def admin_dashboard():
                     LIMIT 5
                     """
                 )
-                latest_actions = cur.fetchall()
+                data["latest_actions"] = cur.fetchall()
         except Error as e:
             app.logger.error(f"Dashboard query error: {e}")
+            return None
         finally:
             conn.close()
-    return render_template("admin/dashboard.html", stats=stats, latest_contacts=latest_contacts, latest_actions=latest_actions)
+        return data
+
+    data = cached("admin:dashboard", tuple(STAT_COUNTER_TABLES.values()), load, DASHBOARD_CACHE_TTL)
+    if data is None:
+        data = {"stats": dict.fromkeys(STAT_COUNTER_TABLES, 0), "latest_contacts": [], "latest_actions": []}
+    return render_template(
+        "admin/dashboard.html",
+        stats=data["stats"],
+        latest_contacts=data["latest_contacts"],
+        latest_actions=data["latest_actions"],
+        freshness={k: data.get(k) for k in ("loaded_at", "counted_at", "reconciled_at")},
+    )
+
+
+@app.route("/admin/pool.json")
+@admin_required
+def admin_pool_stats():
+    """Connection pool stats for this worker (use to size DB_POOL_SIZE / DB_POOL_MAX_OVERFLOW)."""
+    return jsonify(get_db_pool().stats())
+
+
+@app.route("/admin/audit-queue.json")
+@admin_required
+def admin_audit_queue_stats():
+    """Audit log write-behind queue stats for this worker."""
+    return jsonify(get_audit_writer().stats())
 
 
 # ---------------------- Admin: Auth Activity Monitoring ----------------------
+ACTIVITY_PAGE_SIZE = int(os.getenv("ACTIVITY_PAGE_SIZE", "50") or 50)
+
+
+def encode_cursor(*values):
+    """Opaque keyset-pagination token for the sort-key values of the last row on a page."""
+    plain = [v.isoformat(sep=" ") if isinstance(v, datetime) else v.isoformat() if isinstance(v, date) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, size):
+    """Inverse of encode_cursor(); None for a missing or malformed token."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) and len(values) == size else None
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+    except ValueError:
+        return None
+
+
 @app.route("/admin/activity")
 @admin_required
 def admin_activity():
-    """Show recent authentication and access activity."""
+    """Show authentication and access activity, filtered and paged in SQL."""
     rows = []
     summary = {"logins": 0, "failures": 0, "logouts": 0}
-    device_filter = (request.args.get("device") or "").lower()
-    if device_filter not in ("mobile", "desktop", ""):
-        device_filter = ""
+    filters = {
+        "device": (request.args.get("device") or "").lower(),
+        "action": request.args.get("action") or "",
+        "user": (request.args.get("user") or "").strip(),
+        "from": request.args.get("from") or "",
+        "to": request.args.get("to") or "",
+    }
+    if filters["device"] not in ("mobile", "desktop", "unknown"):
+        filters["device"] = ""
+    if filters["action"] not in ("login_success", "login_failure", "logout"):
+        filters["action"] = ""
+    day_from, day_to = _parse_day(filters["from"]), _parse_day(filters["to"])
+    if not day_from:
+        filters["from"] = ""
+    if not day_to:
+        filters["to"] = ""
+
+    where, params = [], []
+    if filters["device"]:
+        where.append("device_type=%s")
+        params.append(filters["device"])
+    if filters["action"]:
+        where.append("action=%s")
+        params.append(filters["action"])
+    if filters["user"]:
+        if filters["user"].startswith("#") and filters["user"][1:].isdigit():
+            where.append("user_id=%s")
+            params.append(int(filters["user"][1:]))
+        else:
+            where.append("username=%s")
+            params.append(filters["user"])
+    if day_from:
+        where.append("at >= %s")
+        params.append(day_from)
+    if day_to:
+        where.append("at < %s")
+        params.append(day_to + timedelta(days=1))
+    cursor = decode_cursor(request.args.get("before"), 2)
+    if cursor:
+        # Keyset: strictly older than the last row already shown, ties broken by id
+        where.append("(at < %s OR (at = %s AND id < %s))")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    next_cursor = None
+
     conn = get_db_connection()
     if conn:
-        ensure_auth_logs_table(conn)
         try:
             with conn.cursor(dictionary=True) as cur:
                 cur.execute(
-                    """
+                    f"""
                     SELECT id, username, user_id, is_admin, action, ip, user_agent, device_type, at
                     FROM auth_logs
-                    ORDER BY at DESC
-                    LIMIT 200
-                    """
+                    {"WHERE " + " AND ".join(where) if where else ""}
+                    ORDER BY at DESC, id DESC
+                    LIMIT %s
+                    """,
+                    (*params, ACTIVITY_PAGE_SIZE + 1),
                 )
                 rows = cur.fetchall() or []
-                if device_filter:
-                    filtered = []
-                    for r in rows:
-                        ua = r.get("user_agent") if isinstance(r, dict) else None
-                        dt = r.get("device_type") if isinstance(r, dict) else None
-                        dt = (dt or _detect_device_type(ua)).lower()
-                        if dt == device_filter:
-                            filtered.append(r)
-                    rows = filtered
+                if len(rows) > ACTIVITY_PAGE_SIZE:
+                    rows = rows[:ACTIVITY_PAGE_SIZE]
+                    next_cursor = encode_cursor(rows[-1]["at"], rows[-1]["id"])
                 # summary counts (last 7 days)
                 cur.execute(
                     """
@@ -853,69 +2980,188 @@ def admin_activity():
             app.logger.error(f"admin_activity query error: {e}")
         finally:
             conn.close()
-    return render_template("admin/activity_logs.html", rows=rows, summary=summary, device_filter=device_filter)
+    active_filters = {k: v for k, v in filters.items() if v}
+    return render_template(
+        "admin/activity_logs.html",
+        rows=rows,
+        summary=summary,
+        device_filter=filters["device"],
+        filters=filters,
+        active_filters=active_filters,
+        next_cursor=next_cursor,
+        is_first_page=cursor is None,
+    )
+
+
+# ---------------------- Admin: Data export ----------------------
+# Streams rows from an unbuffered server-side cursor in EXPORT_CHUNK_ROWS batches, so
+# memory stays flat regardless of table size. Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD
+# filter on the dataset's date column.
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000") or 1000)
+EXPORT_DATASETS = {
+    # name: (columns, date column, ORDER BY that an index can deliver without a sort)
+    "tasks": (
+        ("id", "title", "description", "employee_id", "status", "priority", "due_date",
+         "created_at", "updated_at", "attachment_filename", "github_url"),
+        "created_at",
+        "id",
+    ),
+    "contacts": (("id", "name", "email", "message", "created_at"), "created_at", "created_at, id"),
+    "auth_logs": (
+        ("id", "username", "user_id", "is_admin", "action", "ip", "user_agent", "device_type", "at"),
+        "at",
+        "at, id",
+    ),
+    "admin_actions": (
+        ("id", "actor", "target_user_id", "device_id", "tool", "action", "status", "notes", "metadata",
+         "started_at", "ended_at"),
+        "started_at",
+        "started_at, id",
+    ),
+}
 
 
-# ---------------------- Admin: Remote Management Actions ----------------------
-def ensure_admin_actions_table(conn):
-    """Create admin_actions table if it does not exist."""
+def _export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
+    return value
+
+
+def _release_export_connection(conn, cur, write_timeout, finished):
+    """Leave a pooled connection as the export found it, or drop it from the pool.
+
+    An export cut short (client gone, query error) still has unread rows of an unbuffered
+    result on the wire; draining an arbitrarily large remainder costs more than reconnecting,
+    so such a connection is closed instead of being returned.
+    """
+    if not finished:
+        conn.invalidate()
+        return
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS admin_actions (
-                  id INT UNSIGNED NOT NULL AUTO_INCREMENT,
-                  actor VARCHAR(100) NULL,
-                  target_user_id INT UNSIGNED NULL,
-                  device_id VARCHAR(100) NULL,
-                  tool ENUM('AnyDesk','RDP','VNC','MDM','Other') NOT NULL DEFAULT 'Other',
-                  action VARCHAR(100) NOT NULL,
-                  status ENUM('initiated','in_progress','completed','failed') NOT NULL DEFAULT 'initiated',
-                  notes TEXT NULL,
-                  metadata TEXT NULL,
-                  started_at DATETIME NOT NULL,
-                  ended_at DATETIME NULL,
-                  PRIMARY KEY (id),
-                  INDEX (target_user_id),
-                  INDEX (tool),
-                  INDEX (status),
-                  INDEX (started_at)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """
-            )
-        conn.commit()
+        if cur is not None:
+            cur.close()
+        if write_timeout is not None:
+            with conn.cursor() as reset:
+                reset.execute("SET SESSION net_write_timeout = %s", (int(write_timeout),))
     except Error as e:
-        app.logger.error(f"ensure_admin_actions_table error: {e}")
+        app.logger.warning(f"Export connection reset failed, discarding it: {e}")
+        conn.invalidate()
+
+
+@app.route("/admin/export/<dataset>.<any(csv, ndjson):fmt>")
+@admin_required
+def admin_export(dataset, fmt):
+    """Download a table as CSV or NDJSON, streamed in chunks."""
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"error": "unknown_dataset"}), 404
+    columns, date_col, order_by = EXPORT_DATASETS[dataset]
+    where, params = [], []
+    day_from, day_to = _parse_day(request.args.get("from")), _parse_day(request.args.get("to"))
+    if day_from:
+        where.append(f"{date_col} >= %s")
+        params.append(day_from)
+    if day_to:
+        where.append(f"{date_col} < %s")
+        params.append(day_to + timedelta(days=1))
+    sql = (
+        f"SELECT {', '.join(columns)} FROM {dataset}"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + f" ORDER BY {order_by}"
+    )
+
+    def generate():
+        with db_connection() as conn:
+            if not conn:
+                app.logger.error(f"Export {dataset}: database not available")
+                return
+            write_timeout, cur, finished = None, None, False
+            try:
+                with conn.cursor() as setup:
+                    # A slow client must not trip the server's write timeout mid-export
+                    setup.execute("SELECT @@SESSION.net_write_timeout")
+                    write_timeout = setup.fetchone()[0]
+                    setup.execute("SET SESSION net_write_timeout = 600")
+                cur = conn.cursor(buffered=False)
+                cur.execute(sql, params)
+                if fmt == "csv":
+                    buf = io.StringIO()
+                    writer = csv.writer(buf)
+                    writer.writerow(columns)
+                    yield buf.getvalue()
+                while True:
+                    rows = cur.fetchmany(EXPORT_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    if fmt == "csv":
+                        buf.seek(0)
+                        buf.truncate()
+                        writer.writerows([_export_value(v) for v in row] for row in rows)
+                        yield buf.getvalue()
+                    else:
+                        yield "".join(
+                            json.dumps(dict(zip(columns, map(_export_value, row))), default=str) + "\n"
+                            for row in rows
+                        )
+                finished = True
+            except Error as e:
+                # Headers are already sent; log and end the stream early
+                app.logger.error(f"Export {dataset} error: {e}")
+            finally:
+                # Runs on client disconnect too (GeneratorExit at a yield)
+                _release_export_connection(conn, cur, write_timeout, finished)
+
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    resp = app.response_class(
+        stream_with_context(generate()),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+    )
+    resp.headers["Content-Disposition"] = f'attachment; filename="{dataset}-{stamp}.{fmt}"'
+    resp.headers["X-Accel-Buffering"] = "no"  # let nginx pass chunks straight through
+    return resp
+
 
+# ---------------------- Admin: Remote Management Actions ----------------------
+def log_admin_action(actor: str, action: str, tool: str = 'Other', target_user_id: int = None, device_id: str = None, status: str = 'initiated', notes: str = None, metadata: str = None, ended: bool = False, sync: bool = False):
+    """Queue an admin_actions row for the background audit writer.
 
-def log_admin_action(actor: str, action: str, tool: str = 'Other', target_user_id: int = None, device_id: str = None, status: str = 'initiated', notes: str = None, metadata: str = None, ended: bool = False):
+    With sync=True the row is inserted before returning (False if that failed), for callers
+    that redirect to a page expected to show it.
+    """
+    now = datetime.utcnow()
+    row = {
+        "actor": actor,
+        "target_user_id": target_user_id,
+        "device_id": device_id,
+        "tool": tool,
+        "action": action,
+        "status": status,
+        "notes": notes,
+        "metadata": metadata,
+        "started_at": now,
+        "ended_at": now if ended else None,
+    }
+    if not sync:
+        return get_audit_writer().submit("admin_actions", row)
     conn = get_db_connection()
     if not conn:
-        return
-    ensure_admin_actions_table(conn)
+        return False
+    cols = AUDIT_TABLE_COLUMNS["admin_actions"]
     try:
         with conn.cursor() as cur:
-            if ended:
-                cur.execute(
-                    """
-                    INSERT INTO admin_actions (actor, target_user_id, device_id, tool, action, status, notes, metadata, started_at, ended_at)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    """,
-                    (actor, target_user_id, device_id, tool, action, status, notes, metadata, datetime.utcnow(), datetime.utcnow()),
-                )
-            else:
-                cur.execute(
-                    """
-                    INSERT INTO admin_actions (actor, target_user_id, device_id, tool, action, status, notes, metadata, started_at)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    """,
-                    (actor, target_user_id, device_id, tool, action, status, notes, metadata, datetime.utcnow()),
-                )
-            conn.commit()
+            cur.execute(
+                f"INSERT INTO admin_actions ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})",
+                tuple(row[c] for c in cols),
+            )
+        conn.commit()
     except Error as e:
         app.logger.error(f"log_admin_action error: {e}")
+        return False
     finally:
         conn.close()
+    invalidate_cache("admin_actions")
+    return True
 
 
 @app.route('/admin/actions')
@@ -924,7 +3170,6 @@ def admin_actions_list():
     rows = []
     conn = get_db_connection()
     if conn:
-        ensure_admin_actions_table(conn)
         try:
             with conn.cursor(dictionary=True) as cur:
                 cur.execute(
@@ -953,8 +3198,11 @@ def admin_actions_new():
         target_user_id = int(target_user_id) if target_user_id and target_user_id.isdigit() else None
         device_id = (request.form.get('device_id') or '').strip() or None
         notes = (request.form.get('notes') or '').strip() or None
-        log_admin_action(actor='admin', action=action_name, tool=tool, target_user_id=target_user_id, device_id=device_id, status='initiated', notes=notes)
-        flash('Admin action logged.', 'success')
+        # Written synchronously: the list we redirect to must already show it
+        if log_admin_action(actor='admin', action=action_name, tool=tool, target_user_id=target_user_id, device_id=device_id, status='initiated', notes=notes, sync=True):
+            flash('Admin action logged.', 'success')
+        else:
+            flash('Could not log admin action.', 'danger')
         return redirect(url_for('admin_actions_list'))
     return render_template('admin/action_form.html')
 
@@ -964,11 +3212,11 @@ def admin_actions_new():
 def admin_actions_complete(action_id):
     conn = get_db_connection()
     if conn:
-        ensure_admin_actions_table(conn)
         try:
             with conn.cursor() as cur:
                 cur.execute("UPDATE admin_actions SET status=%s, ended_at=%s WHERE id=%s", ('completed', datetime.utcnow(), action_id))
                 conn.commit()
+                invalidate_cache("admin_actions")
             flash('Action marked as completed.', 'success')
         except Error as e:
             app.logger.error(f"admin_actions_complete error: {e}")
@@ -985,8 +3233,7 @@ def mdm_webhook():
     Body JSON example:
     {"action":"remote_session","tool":"AnyDesk","target_user_id":1,"device_id":"PC-123","status":"completed","notes":"duration 10m"}
     """
-    load_dotenv(override=True)
-    expected = os.getenv('MDM_WEBHOOK_TOKEN')
+    expected = get_setting('MDM_WEBHOOK_TOKEN')
     provided = request.headers.get('X-Auth-Token') or request.args.get('token')
     if not expected or provided != expected:
         return jsonify({"error":"unauthorized"}), 401
@@ -1001,8 +3248,7 @@ def mdm_webhook():
         notes = data.get('notes')
         metadata = data.get('metadata')
         if isinstance(metadata, (dict, list)):
-            import json as _json
-            metadata = _json.dumps(metadata)
+            metadata = json.dumps(metadata)
         log_admin_action(actor='mdm', action=action_name, tool=tool, target_user_id=target_user_id, device_id=device_id, status=status, notes=notes, metadata=metadata, ended=(status in ('completed','failed')))
         return jsonify({"ok":True})
     except Exception as e:
@@ -1043,13 +3289,11 @@ def admin_services_new():
             if not allowed_file(file.filename):
                 flash("Invalid image type. Allowed: png, jpg, jpeg, gif, webp", "danger")
                 return redirect(url_for("admin_services_new"))
-            safe_name = secure_filename(file.filename)
-            # ensure unique filename
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            name, ext = os.path.splitext(safe_name)
-            image_filename = f"{name}-{timestamp}{ext}"
-            save_path = os.path.join(app.static_folder, UPLOAD_SUBDIR, image_filename)
-            file.save(save_path)
+            try:
+                image_filename = store_upload(file)
+            except UploadTooLarge as e:
+                flash(f"Upload too large: {e}.", "danger")
+                return redirect(url_for("admin_services_new"))
         if not title:
             flash("Title is required.", "danger")
             return redirect(url_for("admin_services_new"))
@@ -1074,6 +3318,7 @@ def admin_services_new():
                         ),
                     )
                     conn.commit()
+                    invalidate_cache("services")
                 flash("Service created.", "success")
                 return redirect(url_for("admin_services_list"))
             except Error as e:
@@ -1100,12 +3345,11 @@ def admin_services_edit(service_id):
             if not allowed_file(file.filename):
                 flash("Invalid image type. Allowed: png, jpg, jpeg, gif, webp", "danger")
                 return redirect(url_for("admin_services_edit", service_id=service_id))
-            safe_name = secure_filename(file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            name, ext = os.path.splitext(safe_name)
-            image_filename = f"{name}-{timestamp}{ext}"
-            save_path = os.path.join(app.static_folder, UPLOAD_SUBDIR, image_filename)
-            file.save(save_path)
+            try:
+                image_filename = store_upload(file)
+            except UploadTooLarge as e:
+                flash(f"Upload too large: {e}.", "danger")
+                return redirect(url_for("admin_services_edit", service_id=service_id))
         if not title:
             flash("Title is required.", "danger")
             return redirect(url_for("admin_services_edit", service_id=service_id))
@@ -1123,6 +3367,7 @@ def admin_services_edit(service_id):
                             (title, description, is_active, featured, sort_order, datetime.utcnow(), service_id),
                         )
                     conn.commit()
+                    invalidate_cache("services")
                 flash("Service updated.", "success")
                 return redirect(url_for("admin_services_list"))
             except Error as e:
@@ -1175,6 +3420,7 @@ def admin_employees_new():
     if request.method == "POST":
         name = request.form.get("name", "").strip()
         position = request.form.get("position", "").strip()
+        email = request.form.get("email", "").strip() or None
         is_active = 1 if request.form.get("is_active") == "on" else 0
         sort_order = int(request.form.get("sort_order", "0") or 0)
         photo_filename = None
@@ -1183,11 +3429,11 @@ def admin_employees_new():
             if not allowed_file(file.filename):
                 flash("Invalid image type. Allowed: png, jpg, jpeg, gif, webp", "danger")
                 return redirect(url_for("admin_employees_new"))
-            safe_name = secure_filename(file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            name_noext, ext = os.path.splitext(safe_name)
-            photo_filename = f"{name_noext}-{timestamp}{ext}"
-            file.save(os.path.join(app.static_folder, UPLOAD_SUBDIR, photo_filename))
+            try:
+                photo_filename = store_upload(file)
+            except UploadTooLarge as e:
+                flash(f"Upload too large: {e}.", "danger")
+                return redirect(url_for("admin_employees_new"))
         if not name or not position:
             flash("Name and position are required.", "danger")
             return redirect(url_for("admin_employees_new"))
@@ -1197,12 +3443,13 @@ def admin_employees_new():
                 with conn.cursor() as cur:
                     cur.execute(
                         """
-                        INSERT INTO employees (name, position, photo_filename, is_active, sort_order, created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        INSERT INTO employees (name, position, email, photo_filename, is_active, sort_order, created_at, updated_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                         """,
-                        (name, position, photo_filename, is_active, sort_order, datetime.utcnow(), datetime.utcnow()),
+                        (name, position, email, photo_filename, is_active, sort_order, datetime.utcnow(), datetime.utcnow()),
                     )
                     conn.commit()
+                    invalidate_cache("employees")
                 flash("Employee created.", "success")
                 return redirect(url_for("admin_employees_list"))
             except Error as e:
@@ -1220,6 +3467,7 @@ def admin_employees_edit(emp_id):
     if request.method == "POST":
         name = request.form.get("name", "").strip()
         position = request.form.get("position", "").strip()
+        email = request.form.get("email", "").strip() or None
         is_active = 1 if request.form.get("is_active") == "on" else 0
         sort_order = int(request.form.get("sort_order", "0") or 0)
         photo_filename = None
@@ -1228,11 +3476,11 @@ def admin_employees_edit(emp_id):
             if not allowed_file(file.filename):
                 flash("Invalid image type. Allowed: png, jpg, jpeg, gif, webp", "danger")
                 return redirect(url_for("admin_employees_edit", emp_id=emp_id))
-            safe_name = secure_filename(file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            name_noext, ext = os.path.splitext(safe_name)
-            photo_filename = f"{name_noext}-{timestamp}{ext}"
-            file.save(os.path.join(app.static_folder, UPLOAD_SUBDIR, photo_filename))
+            try:
+                photo_filename = store_upload(file)
+            except UploadTooLarge as e:
+                flash(f"Upload too large: {e}.", "danger")
+                return redirect(url_for("admin_employees_edit", emp_id=emp_id))
         if not name or not position:
             flash("Name and position are required.", "danger")
             return redirect(url_for("admin_employees_edit", emp_id=emp_id))
@@ -1241,15 +3489,16 @@ def admin_employees_edit(emp_id):
                 with conn.cursor() as cur:
                     if photo_filename:
                         cur.execute(
-                            "UPDATE employees SET name=%s, position=%s, photo_filename=%s, is_active=%s, sort_order=%s, updated_at=%s WHERE id=%s",
-                            (name, position, photo_filename, is_active, sort_order, datetime.utcnow(), emp_id),
+                            "UPDATE employees SET name=%s, position=%s, email=%s, photo_filename=%s, is_active=%s, sort_order=%s, updated_at=%s WHERE id=%s",
+                            (name, position, email, photo_filename, is_active, sort_order, datetime.utcnow(), emp_id),
                         )
                     else:
                         cur.execute(
-                            "UPDATE employees SET name=%s, position=%s, is_active=%s, sort_order=%s, updated_at=%s WHERE id=%s",
-                            (name, position, is_active, sort_order, datetime.utcnow(), emp_id),
+                            "UPDATE employees SET name=%s, position=%s, email=%s, is_active=%s, sort_order=%s, updated_at=%s WHERE id=%s",
+                            (name, position, email, is_active, sort_order, datetime.utcnow(), emp_id),
                         )
                     conn.commit()
+                    invalidate_cache("employees")
                 flash("Employee updated.", "success")
                 return redirect(url_for("admin_employees_list"))
             except Error as e:
@@ -1264,7 +3513,7 @@ def admin_employees_edit(emp_id):
         try:
             with conn.cursor(dictionary=True) as cur:
                 cur.execute(
-                    "SELECT id, name, position, photo_filename, is_active, sort_order FROM employees WHERE id=%s",
+                    "SELECT id, name, position, email, photo_filename, is_active, sort_order FROM employees WHERE id=%s",
                     (emp_id,),
                 )
                 employee = cur.fetchone()
@@ -1287,6 +3536,7 @@ def admin_employees_delete(emp_id):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM employees WHERE id=%s", (emp_id,))
                 conn.commit()
+                invalidate_cache("employees")
             flash("Employee deleted.", "info")
         except Error as e:
             app.logger.error(f"Employee delete error: {e}")
@@ -1304,6 +3554,7 @@ def admin_services_delete(service_id):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM services WHERE id=%s", (service_id,))
                 conn.commit()
+                invalidate_cache("services")
             flash("Service deleted.", "info")
         except Error as e:
             app.logger.error(f"Service delete error: {e}")
@@ -1314,41 +3565,102 @@ def admin_services_delete(service_id):
 
 
 # ---------------------- Admin Tasks CRUD ----------------------
+TASKS_PAGE_SIZE = int(os.getenv("TASKS_PAGE_SIZE", "50") or 50)
+TASKS_COUNT_CAP = 1000  # filtered counts stop here and show "1000+"
+
+
+def _task_text_predicate(q):
+    """FULLTEXT predicate for the search box (prefix match on every word), or LIKE for short words."""
+    words = [w for w in re.findall(r"\w+", q) if len(w) >= 3]
+    if words:
+        return "MATCH(t.title, t.description) AGAINST (%s IN BOOLEAN MODE)", " ".join(f"+{w}*" for w in words)
+    return "t.title LIKE %s", f"%{q}%"
+
+
 @app.route("/admin/tasks")
 @admin_required
 def admin_tasks_list():
     # Filters
     status = request.args.get("status") or ""
     assignee = request.args.get("assignee") or ""
+    priority = request.args.get("priority") or ""
+    q = (request.args.get("q") or "").strip()[:100]
+    due_from = _parse_day(request.args.get("due_from"))
+    due_to = _parse_day(request.args.get("due_to"))
     where = []
     params = []
-    if status in {"todo", "in_progress", "done", "blocked"}:
-        where.append("t.status=%s")
-        params.append(status)
+    if status in TASK_STATUS_RANK:
+        # Filter on the rank so the (status_rank, due_sort, ...) index serves filter and order
+        where.append("t.status_rank=%s")
+        params.append(TASK_STATUS_RANK[status])
     if assignee.isdigit():
         where.append("t.employee_id=%s")
         params.append(int(assignee))
+    if priority in ("low", "medium", "high"):
+        where.append("t.priority=%s")
+        params.append(priority)
+    else:
+        priority = ""
+    if due_from:
+        where.append("t.due_date >= %s")
+        params.append(due_from.date())
+    if due_to:
+        where.append("t.due_date <= %s")
+        params.append(due_to.date())
+    if q:
+        predicate, value = _task_text_predicate(q)
+        where.append(predicate)
+        params.append(value)
+    filters = {
+        "status": status if status in TASK_STATUS_RANK else "",
+        "assignee": assignee if assignee.isdigit() else "",
+        "priority": priority,
+        "q": q,
+        "due_from": due_from.strftime("%Y-%m-%d") if due_from else "",
+        "due_to": due_to.strftime("%Y-%m-%d") if due_to else "",
+    }
+    active_filters = {k: v for k, v in filters.items() if v}
+
+    # Keyset on the index order: status_rank ASC, due_sort ASC, created_at DESC, id DESC
+    page_where, page_params = list(where), list(params)
+    cursor = decode_cursor(request.args.get("after"), 4)
+    if cursor:
+        rank, due, created, last_id = cursor
+        page_where.append(
+            "(t.status_rank > %s OR (t.status_rank = %s AND (t.due_sort > %s OR (t.due_sort = %s AND "
+            "(t.created_at < %s OR (t.created_at = %s AND t.id < %s))))))"
+        )
+        page_params.extend([rank, rank, due, due, created, created, last_id])
 
     conn = get_db_connection()
     tasks = []
     employees = []
+    total = None
+    total_capped = False
+    next_cursor = None
     if conn:
         try:
             with conn.cursor(dictionary=True) as cur:
-                base_sql = (
-                    """
-                    SELECT t.id, t.title, t.description, t.status, t.priority, t.due_date, t.created_at, t.updated_at,
-                           t.attachment_filename, t.github_url,
-                           e.name AS employee_name, e.id AS employee_id
-                    FROM tasks t
-                    LEFT JOIN employees e ON e.id = t.employee_id
-                    {where_clause}
-                    ORDER BY FIELD(t.status,'blocked','in_progress','todo','done'), t.due_date IS NULL, t.due_date ASC, t.created_at DESC
-                    """
-                )
-                where_clause = (" WHERE " + " AND ".join(where)) if where else ""
-                cur.execute(base_sql.format(where_clause=where_clause), params)
+                where_clause = (" WHERE " + " AND ".join(page_where)) if page_where else ""
+                cur.execute(ADMIN_TASKS_SQL.format(where_clause=where_clause) + " LIMIT %s", (*page_params, TASKS_PAGE_SIZE + 1))
                 tasks = cur.fetchall()
+                if len(tasks) > TASKS_PAGE_SIZE:
+                    tasks = tasks[:TASKS_PAGE_SIZE]
+                    last = tasks[-1]
+                    next_cursor = encode_cursor(last["status_rank"], last["due_sort"], last["created_at"], last["id"])
+                # Count estimate: the maintained counter when unfiltered, a capped count otherwise
+                if not where:
+                    cur.execute("SELECT value FROM stat_counters WHERE name='tasks'")
+                    row = cur.fetchone()
+                    total = int(row["value"]) if row else None
+                else:
+                    cur.execute(
+                        f"SELECT COUNT(*) AS c FROM (SELECT 1 FROM tasks t WHERE {' AND '.join(where)} LIMIT %s) x",
+                        (*params, TASKS_COUNT_CAP + 1),
+                    )
+                    total = int((cur.fetchone() or {}).get("c", 0))
+                    if total > TASKS_COUNT_CAP:
+                        total, total_capped = TASKS_COUNT_CAP, True
                 # Employees for filter dropdown
                 cur.execute("SELECT id, name FROM employees WHERE is_active=1 ORDER BY name ASC")
                 employees = cur.fetchall()
@@ -1356,79 +3668,91 @@ def admin_tasks_list():
             app.logger.error(f"Tasks list error: {e}")
         finally:
             conn.close()
-    return render_template("admin/tasks_list.html", tasks=tasks, employees=employees, cur_status=status, cur_assignee=assignee)
+    return render_template(
+        "admin/tasks_list.html",
+        tasks=tasks,
+        employees=employees,
+        cur_status=filters["status"],
+        cur_assignee=filters["assignee"],
+        filters=filters,
+        active_filters=active_filters,
+        next_cursor=next_cursor,
+        is_first_page=cursor is None,
+        total=total,
+        total_capped=total_capped,
+    )
 
 
 @app.route("/admin/tasks/new", methods=["GET", "POST"])
 @admin_required
 def admin_tasks_new():
     conn = get_db_connection()
-    # Fetch employees for assignment dropdown
     employees = []
-    if conn:
-        try:
-            with conn.cursor(dictionary=True) as cur:
-                cur.execute("SELECT id, name FROM employees WHERE is_active=1 ORDER BY sort_order ASC, name ASC")
-                employees = cur.fetchall()
-        except Error as e:
-            app.logger.error(f"Employees fetch for tasks error: {e}")
-        finally:
-            conn.close()
-
-    if request.method == "POST":
-        title = request.form.get("title", "").strip()
-        description = request.form.get("description", "").strip()
-        employee_id_raw = request.form.get("employee_id")
-        employee_id = int(employee_id_raw) if employee_id_raw else None
-        status = request.form.get("status", "todo")
-        priority = request.form.get("priority", "medium")
-        due_date = request.form.get("due_date") or None
-        github_url = (request.form.get("github_url") or "").strip() or None
-        # handle attachment image
-        attachment_filename = None
-        file = request.files.get("attachment")
-        if file and file.filename:
-            if not allowed_file(file.filename):
-                flash("Invalid attachment type. Allowed: png, jpg, jpeg, gif, webp", "danger")
-                return redirect(url_for("admin_tasks_new"))
-            safe_name = secure_filename(file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            name_noext, ext = os.path.splitext(safe_name)
-            attachment_filename = f"{name_noext}-{timestamp}{ext}"
-            file.save(os.path.join(app.static_folder, UPLOAD_SUBDIR, attachment_filename))
-        if not title:
-            flash("Title is required.", "danger")
-            return redirect(url_for("admin_tasks_new"))
-        conn2 = get_db_connection()
-        if conn2:
+    try:
+        # Fetch employees for assignment dropdown
+        if conn:
             try:
-                with conn2.cursor() as cur:
-                    cur.execute(
-                        """
-                        INSERT INTO tasks (title, description, employee_id, status, priority, attachment_filename, github_url, due_date, created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (
-                            title,
-                            description or None,
-                            employee_id,
-                            status,
-                            priority,
-                            attachment_filename,
-                            github_url,
-                            due_date,
-                            datetime.utcnow(),
-                            datetime.utcnow(),
-                        ),
-                    )
-                    conn2.commit()
-                flash("Task created.", "success")
-                return redirect(url_for("admin_tasks_list"))
+                with conn.cursor(dictionary=True) as cur:
+                    cur.execute("SELECT id, name FROM employees WHERE is_active=1 ORDER BY sort_order ASC, name ASC")
+                    employees = cur.fetchall()
             except Error as e:
-                app.logger.error(f"Task create error: {e}")
-                flash("Error creating task.", "danger")
-            finally:
-                conn2.close()
+                app.logger.error(f"Employees fetch for tasks error: {e}")
+
+        if request.method == "POST":
+            title = request.form.get("title", "").strip()
+            description = request.form.get("description", "").strip()
+            employee_id_raw = request.form.get("employee_id")
+            employee_id = int(employee_id_raw) if employee_id_raw else None
+            status = request.form.get("status", "todo")
+            priority = request.form.get("priority", "medium")
+            due_date = request.form.get("due_date") or None
+            github_url = (request.form.get("github_url") or "").strip() or None
+            # handle attachment image
+            attachment_filename = None
+            file = request.files.get("attachment")
+            if file and file.filename:
+                if not allowed_file(file.filename):
+                    flash("Invalid attachment type. Allowed: png, jpg, jpeg, gif, webp", "danger")
+                    return redirect(url_for("admin_tasks_new"))
+                try:
+                    attachment_filename = store_upload(file)
+                except UploadTooLarge as e:
+                    flash(f"Upload too large: {e}.", "danger")
+                    return redirect(url_for("admin_tasks_new"))
+            if not title:
+                flash("Title is required.", "danger")
+                return redirect(url_for("admin_tasks_new"))
+            if conn:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            """
+                            INSERT INTO tasks (title, description, employee_id, status, priority, attachment_filename, github_url, due_date, created_at, updated_at)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                            """,
+                            (
+                                title,
+                                description or None,
+                                employee_id,
+                                status,
+                                priority,
+                                attachment_filename,
+                                github_url,
+                                due_date,
+                                datetime.utcnow(),
+                                datetime.utcnow(),
+                            ),
+                        )
+                        conn.commit()
+                        invalidate_cache("tasks")
+                    flash("Task created.", "success")
+                    return redirect(url_for("admin_tasks_list"))
+                except Error as e:
+                    app.logger.error(f"Task create error: {e}")
+                    flash("Error creating task.", "danger")
+    finally:
+        if conn:
+            conn.close()
     return render_template("admin/task_form.html", mode="new", task=None, employees=employees)
 
 
@@ -1451,11 +3775,11 @@ def admin_tasks_edit(task_id):
             if not allowed_file(file.filename):
                 flash("Invalid attachment type. Allowed: png, jpg, jpeg, gif, webp", "danger")
                 return redirect(url_for("admin_tasks_edit", task_id=task_id))
-            safe_name = secure_filename(file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            name_noext, ext = os.path.splitext(safe_name)
-            attachment_filename = f"{name_noext}-{timestamp}{ext}"
-            file.save(os.path.join(app.static_folder, UPLOAD_SUBDIR, attachment_filename))
+            try:
+                attachment_filename = store_upload(file)
+            except UploadTooLarge as e:
+                flash(f"Upload too large: {e}.", "danger")
+                return redirect(url_for("admin_tasks_edit", task_id=task_id))
         if not title:
             flash("Title is required.", "danger")
             return redirect(url_for("admin_tasks_edit", task_id=task_id))
@@ -1482,6 +3806,7 @@ def admin_tasks_edit(task_id):
                             (title, description or None, employee_id, status, priority, github_url, due_date, datetime.utcnow(), task_id),
                         )
                     conn.commit()
+                    invalidate_cache("tasks")
                 flash("Task updated.", "success")
                 return redirect(url_for("admin_tasks_list"))
             except Error as e:
@@ -1523,6 +3848,7 @@ def admin_tasks_delete(task_id):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM tasks WHERE id=%s", (task_id,))
                 conn.commit()
+                invalidate_cache("tasks")
             flash("Task deleted.", "info")
         except Error as e:
             app.logger.error(f"Task delete error: {e}")
@@ -1532,6 +3858,587 @@ def admin_tasks_delete(task_id):
     return redirect(url_for("admin_tasks_list"))
 
 
+# ---------------------- Outbound email queue ----------------------
+# admin_messages only inserts into outbound_emails; `flask --app app mail-worker` sends the
+# queued rows in a separate process, retrying transient SMTP failures with exponential backoff.
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6") or 6)
+MAIL_RETRY_BASE = float(os.getenv("MAIL_RETRY_BASE", "30") or 30)  # seconds, doubled per attempt
+MAIL_RETRY_MAX = float(os.getenv("MAIL_RETRY_MAX", "3600") or 3600)  # seconds
+MAIL_POLL_INTERVAL = float(os.getenv("MAIL_POLL_INTERVAL", "2") or 2)  # seconds, when idle
+MAIL_CLAIM_BATCH = int(os.getenv("MAIL_CLAIM_BATCH", "50") or 50)  # rows sent per SMTP session
+MAIL_MAX_PER_CONNECTION = int(os.getenv("MAIL_MAX_PER_CONNECTION", "100") or 100)
+MAIL_BULK_MAX = int(os.getenv("MAIL_BULK_MAX", "2000") or 2000)  # recipients per bulk send
+ATTACHMENT_SPOOL_MEMORY = int(os.getenv("ATTACHMENT_SPOOL_MEMORY", str(1024 * 1024)) or 1024 * 1024)  # bytes
+MAIL_LOCK_TIMEOUT = int(os.getenv("MAIL_LOCK_TIMEOUT", "600") or 600)  # reclaim rows of a dead worker
+MAIL_SMTP_TIMEOUT = float(os.getenv("MAIL_SMTP_TIMEOUT", "20") or 20)
+OUTBOUND_STATUSES = ("queued", "sending", "sent", "failed")
+
+
+class PermanentMailError(Exception):
+    """A delivery failure that retrying will not fix."""
+
+
+def smtp_settings():
+    settings = current_settings()
+    smtp_user = settings.get("SMTP_USER", "")
+    return {
+        "host": settings.get("SMTP_HOST", "smtp.gmail.com"),
+        "port": int(settings.get("SMTP_PORT", "587")),
+        "user": smtp_user,
+        "password": settings.get("SMTP_PASS", ""),
+        "use_tls": settings.get("SMTP_USE_TLS", "true").lower() != "false",
+        "from": settings.get("EMAIL_FROM", smtp_user or "no-reply@example.com"),
+    }
+
+
+def build_email(row, email_from, attachment=None):
+    """EmailMessage for an outbound_emails row; `attachment` is the row's EncodedAttachment."""
+    msg = EmailMessage()
+    msg["From"] = email_from
+    msg["To"] = row["to_email"]
+    msg["Subject"] = row["subject"]
+    msg.set_content(row.get("body") or "")
+    if attachment:
+        attachment.attach_placeholder(msg)
+    return msg
+
+
+class EncodedAttachment:
+    """An attachment base64-encoded once, incrementally from disk, for reuse by many messages.
+
+    The encoded body goes to a SpooledTemporaryFile (memory up to ATTACHMENT_SPOOL_MEMORY,
+    disk beyond), so neither the raw file nor its MIME encoding is ever held in memory whole.
+    Messages carry a small placeholder part that is swapped for the spool while sending.
+    """
+
+    _LINE = 57  # raw bytes per 76-character base64 line
+
+    def __init__(self, filename, display_name=None):
+        path = os.path.join(app.static_folder, UPLOAD_SUBDIR, filename)
+        if not os.path.exists(path):
+            raise PermanentMailError(f"attachment {filename} no longer exists")
+        ctype, encoding = mimetypes.guess_type(path)
+        if ctype is None:
+            ctype = "application/octet-stream"
+        self.filename = display_name or filename
+        self.maintype, self.subtype = ctype.split("/", 1)
+        self.marker = os.urandom(24)
+        self.encoded_marker = base64.b64encode(self.marker)
+        self.spool = tempfile.SpooledTemporaryFile(max_size=ATTACHMENT_SPOOL_MEMORY)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(self._LINE * 1024)
+                if not chunk:
+                    break
+                self.spool.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+        self.encoded_size = self.spool.tell()
+
+    def attach_placeholder(self, msg):
+        msg.add_attachment(self.marker, maintype=self.maintype, subtype=self.subtype, filename=self.filename)
+
+    def stream(self, msg):
+        """The serialized message as chunks, with the spooled attachment in place of the placeholder."""
+        raw = msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+        prefix, sep, suffix = raw.partition(self.encoded_marker + b"\r\n")
+        if not sep:
+            raise ValueError("attachment placeholder not found in message")
+        return self._chunks(prefix, suffix)
+
+    def _chunks(self, prefix, suffix):
+        yield prefix
+        self.spool.seek(0)
+        while True:
+            chunk = self.spool.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        yield suffix
+
+    def close(self):
+        self.spool.close()
+
+
+class SMTPSession:
+    """One authenticated SMTP connection reused across messages.
+
+    Reconnects after MAIL_MAX_PER_CONNECTION messages (relays cap messages per session) and,
+    once per message, when the connection drops. Per-recipient rejections leave the
+    session usable, since smtplib resets the transaction before raising.
+    """
+
+    def __init__(self, settings, max_per_connection=None):
+        self.settings = settings
+        self.max_per_connection = max_per_connection or MAIL_MAX_PER_CONNECTION
+        self.server = None
+        self.on_connection = 0
+        self.connections = 0
+        self.sent = 0
+
+    def _open(self):
+        server = smtplib.SMTP(self.settings["host"], self.settings["port"], timeout=MAIL_SMTP_TIMEOUT)
+        try:
+            if self.settings["use_tls"]:
+                server.starttls()
+            if self.settings["user"] and self.settings["password"]:
+                server.login(self.settings["user"], self.settings["password"])
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.on_connection = 0
+        self.connections += 1
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def _send_streamed(self, msg, attachment):
+        """SMTP transaction whose DATA is written chunk by chunk instead of as one bytes object."""
+        chunks = attachment.stream(msg)
+        server = self.server
+        server.ehlo_or_helo_if_needed()
+        from_addr, to_addr = parseaddr(msg["From"])[1], parseaddr(msg["To"])[1]
+        code, resp = server.mail(from_addr)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        code, resp = server.rcpt(to_addr)
+        if code not in (250, 251):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused({to_addr: (code, resp)})
+        server.putcmd("data")
+        code, resp = server.getreply()
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+        for chunk in chunks:
+            # Dot-stuffing: the substitution is what makes this safe, and it must stay. It is
+            # only correct per chunk because the spooled chunks are base64, which never contains
+            # "." (spool reads do not end on line boundaries); the prefix/suffix are whole lines.
+            # Do not reuse this loop for bodies that are not base64.
+            server.send(re.sub(rb"(?m)^\.", b"..", chunk))
+        server.send(b".\r\n")
+        code, resp = server.getreply()
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+
+    def send(self, msg, attachment=None):
+        if self.server is not None and self.on_connection >= self.max_per_connection:
+            self.close()
+        for attempt in (1, 2):
+            if self.server is None:
+                self._open()
+            try:
+                if attachment:
+                    self._send_streamed(msg, attachment)
+                else:
+                    self.server.send_message(msg)
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                self.on_connection += 1
+                raise
+            except OSError:
+                # Dropped or timed-out connection (SMTPServerDisconnected is an OSError too)
+                if self.server is not None:
+                    self.server.close()
+                    self.server = None
+                if attempt == 2:
+                    raise
+            else:
+                self.on_connection += 1
+                self.sent += 1
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_permanent_mail_error(e):
+    if isinstance(e, PermanentMailError):
+        return True
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        # 4xx refusals (greylisting, full mailbox) are retried; give up only if every one is 5xx
+        codes = [code for code, _ in e.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return False  # fixed by correcting the SMTP settings; keep retrying until then
+    return isinstance(e, smtplib.SMTPResponseException) and 500 <= e.smtp_code < 600
+
+
+def mail_retry_delay(attempts):
+    """Seconds to wait after the given number of failed attempts (exponential, +/-20% jitter)."""
+    delay = min(MAIL_RETRY_MAX, MAIL_RETRY_BASE * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def enqueue_email(to_email, subject, body, attachment_filename=None, attachment_name=None):
+    """Queue one email; returns the job id, or None if the database is unavailable."""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        now = datetime.utcnow()
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO outbound_emails (to_email, subject, body, attachment_filename, attachment_name, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (%s, %s, %s, %s, %s, 'queued', %s, %s, %s)",
+                (to_email, subject, body, attachment_filename, attachment_name, now, now, now),
+            )
+            conn.commit()
+            return cur.lastrowid
+    except Error as e:
+        app.logger.error(f"Email enqueue error: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+EMAIL_ADDRESS_RE = re.compile(r"^[^@\s,;<>]+@[^@\s,;<>]+\.[^@\s,;<>]+$")
+
+
+def parse_recipient_list(text):
+    """Split a comma/semicolon/whitespace separated list into (valid, invalid), de-duplicated."""
+    seen, valid, invalid = set(), [], []
+    for item in re.split(r"[\s,;]+", text or ""):
+        if not item or item.lower() in seen:
+            continue
+        seen.add(item.lower())
+        (valid if EMAIL_ADDRESS_RE.match(item) else invalid).append(item)
+    return valid, invalid
+
+
+def employee_recipients(active_only=True, position=""):
+    """Email addresses of employees matching the filter; None if the query failed."""
+    where = ["email IS NOT NULL", "email <> ''"]
+    params = []
+    if active_only:
+        where.append("is_active=1")
+    if position:
+        where.append("position LIKE %s")
+        params.append(f"%{position}%")
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT DISTINCT email FROM employees WHERE {' AND '.join(where)} ORDER BY email", params)
+            return [r[0] for r in cur.fetchall() if EMAIL_ADDRESS_RE.match(r[0])]
+    except Error as e:
+        app.logger.error(f"Employee recipients error: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def enqueue_bulk_email(recipients, subject, body, attachment_filename=None, attachment_name=None, audience=None):
+    """Queue one email per recipient under a new outbound_batches row; returns the batch id or None."""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        now = datetime.utcnow()
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO outbound_batches (subject, audience, recipient_count, created_at) VALUES (%s, %s, %s, %s)",
+                (subject, (audience or "")[:255] or None, len(recipients), now),
+            )
+            batch_id = cur.lastrowid
+            rows = [(batch_id, to, subject, body, attachment_filename, attachment_name, now, now, now) for to in recipients]
+            for i in range(0, len(rows), 500):
+                cur.executemany(
+                    "INSERT INTO outbound_emails (batch_id, to_email, subject, body, attachment_filename, attachment_name, status, next_attempt_at, created_at, updated_at) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, 'queued', %s, %s, %s)",
+                    rows[i:i + 500],
+                )
+            conn.commit()
+            return batch_id
+    except Error as e:
+        app.logger.error(f"Bulk email enqueue error: {e}")
+        try:
+            conn.rollback()
+        except Error:
+            pass
+        return None
+    finally:
+        conn.close()
+
+
+def claim_outbound_emails(conn, worker_id, limit=MAIL_CLAIM_BATCH):
+    """Lock up to `limit` due rows for this worker. Rows held by a worker that died are requeued first.
+
+    A dead worker's send counts as an attempt (it may have crashed on that very message), so a
+    row that keeps killing workers ends up failed after MAIL_MAX_ATTEMPTS instead of looping.
+    """
+    now = datetime.utcnow()
+    with conn.cursor(dictionary=True) as cur:
+        # MySQL applies SET assignments left to right, so status/last_error see the new attempts
+        cur.execute(
+            "UPDATE outbound_emails SET attempts=attempts+1, "
+            "status=IF(attempts >= %s, 'failed', 'queued'), "
+            "last_error=IF(status='failed', %s, last_error), "
+            "locked_by=NULL, locked_at=NULL, updated_at=%s "
+            "WHERE status='sending' AND locked_at < %s",
+            (
+                MAIL_MAX_ATTEMPTS,
+                f"worker lock expired after {MAIL_LOCK_TIMEOUT}s (worker died while sending)",
+                now,
+                now - timedelta(seconds=MAIL_LOCK_TIMEOUT),
+            ),
+        )
+        cur.execute(
+            "SELECT id, to_email, subject, body, attachment_filename, attachment_name, attempts FROM outbound_emails "
+            "WHERE status='queued' AND next_attempt_at <= %s ORDER BY next_attempt_at, id LIMIT %s "
+            "FOR UPDATE SKIP LOCKED",
+            (now, limit),
+        )
+        rows = cur.fetchall()
+        if rows:
+            ids = [r["id"] for r in rows]
+            cur.execute(
+                f"UPDATE outbound_emails SET status='sending', locked_by=%s, locked_at=%s, updated_at=%s "
+                f"WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                (worker_id, now, now, *ids),
+            )
+    conn.commit()
+    return rows
+
+
+def refresh_email_lock(conn, row, worker_id):
+    """Renew this worker's lock on a claimed row just before sending it.
+
+    Returns False when the row is no longer ours (requeued as stale and taken by another worker),
+    in which case it must not be sent."""
+    now = datetime.utcnow()
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE outbound_emails SET locked_at=%s, updated_at=%s "
+            "WHERE id=%s AND locked_by=%s AND status='sending'",
+            (now, now, row["id"], worker_id),
+        )
+        owned = cur.rowcount > 0
+    conn.commit()
+    return owned
+
+
+def release_outbound_emails(conn, worker_id):
+    """Requeue every row this worker still holds (after a batch aborted mid-way); returns the count."""
+    now = datetime.utcnow()
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE outbound_emails SET status='queued', locked_by=NULL, locked_at=NULL, updated_at=%s "
+            "WHERE status='sending' AND locked_by=%s",
+            (now, worker_id),
+        )
+        released = cur.rowcount
+    conn.commit()
+    return released
+
+
+def record_delivery(conn, row, worker_id, error=None):
+    """Mark a claimed row sent, or schedule its retry / fail it for good.
+
+    Only touches the row while this worker still holds it; returns False otherwise."""
+    now = datetime.utcnow()
+    attempts = row["attempts"] + 1
+    with conn.cursor() as cur:
+        if error is None:
+            cur.execute(
+                "UPDATE outbound_emails SET status='sent', attempts=%s, sent_at=%s, updated_at=%s, "
+                "locked_by=NULL, locked_at=NULL, last_error=NULL "
+                "WHERE id=%s AND locked_by=%s AND status='sending'",
+                (attempts, now, now, row["id"], worker_id),
+            )
+        else:
+            final = attempts >= MAIL_MAX_ATTEMPTS or is_permanent_mail_error(error)
+            cur.execute(
+                "UPDATE outbound_emails SET status=%s, attempts=%s, next_attempt_at=%s, updated_at=%s, "
+                "locked_by=NULL, locked_at=NULL, last_error=%s "
+                "WHERE id=%s AND locked_by=%s AND status='sending'",
+                (
+                    "failed" if final else "queued",
+                    attempts,
+                    now if final else now + timedelta(seconds=mail_retry_delay(attempts)),
+                    now,
+                    f"{type(error).__name__}: {error}"[:500],
+                    row["id"],
+                    worker_id,
+                ),
+            )
+        recorded = cur.rowcount > 0
+    conn.commit()
+    if not recorded:
+        app.logger.warning(f"mail-worker {worker_id}: lost the lock on outbound email #{row['id']}, outcome not recorded")
+    return recorded
+
+
+def process_outbound_emails(conn, worker_id, limit=MAIL_CLAIM_BATCH):
+    """Send one claimed batch over a single SMTP session; returns the number of rows processed."""
+    rows = claim_outbound_emails(conn, worker_id, limit)
+    if not rows:
+        return 0
+    settings = smtp_settings()
+    started = time.monotonic()
+    attachments = {}  # (file, name) -> EncodedAttachment, encoded once for the whole batch
+    try:
+        with SMTPSession(settings) as smtp:
+            for row in rows:
+                if not refresh_email_lock(conn, row, worker_id):
+                    app.logger.warning(f"mail-worker {worker_id}: outbound email #{row['id']} was reclaimed, skipping")
+                    continue
+                try:
+                    attachment = None
+                    filename = row.get("attachment_filename")
+                    if filename:
+                        key = (filename, row.get("attachment_name"))
+                        if key not in attachments:
+                            attachments[key] = EncodedAttachment(*key)
+                        attachment = attachments[key]
+                    smtp.send(build_email(row, settings["from"], attachment), attachment)
+                except Exception as e:
+                    app.logger.error(f"SMTP send error for outbound email #{row['id']}: {e}")
+                    record_delivery(conn, row, worker_id, e)
+                else:
+                    record_delivery(conn, row, worker_id)
+    finally:
+        for attachment in attachments.values():
+            attachment.close()
+    elapsed = time.monotonic() - started
+    app.logger.info(
+        f"mail-worker {worker_id}: {smtp.sent}/{len(rows)} sent in {elapsed:.2f}s "
+        f"({elapsed * 1000 / len(rows):.1f} ms/recipient, {smtp.connections} SMTP connection(s))"
+    )
+    return len(rows)
+
+
+@app.cli.command("mail-worker")
+@click.option("--once", is_flag=True, help="Send whatever is due now, then exit.")
+def mail_worker_command(once):
+    """Send queued outbound emails until interrupted."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    app.logger.setLevel(logging.INFO)  # per-batch throughput lines
+    print(f"mail-worker {worker_id} started.")
+    try:
+        while True:
+            # A fresh app context per batch so the teardown hook returns the connection
+            with app.app_context():
+                processed = 0
+                try:
+                    with db_connection() as conn:
+                        if conn:
+                            try:
+                                processed = process_outbound_emails(conn, worker_id)
+                            except Exception:
+                                # Hand the unsent part of the batch back instead of waiting out MAIL_LOCK_TIMEOUT
+                                try:
+                                    conn.rollback()
+                                    released = release_outbound_emails(conn, worker_id)
+                                    if released:
+                                        app.logger.warning(f"mail-worker {worker_id}: requeued {released} claimed email(s)")
+                                except Error as e:
+                                    app.logger.error(f"mail-worker: could not requeue claimed emails: {e}")
+                                raise
+                        else:
+                            app.logger.error("mail-worker: database not available")
+                except Exception as e:
+                    app.logger.exception(f"mail-worker error: {e}")
+            if once and not processed:
+                break
+            if not processed:
+                time.sleep(MAIL_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    print(f"mail-worker {worker_id} stopped.")
+
+
+def outbound_batch_progress(cur, batch_ids):
+    """{batch_id: {"sent", "failed", "pending"}} from the (batch_id, status) index."""
+    progress = {bid: {"sent": 0, "failed": 0, "pending": 0} for bid in batch_ids}
+    if batch_ids:
+        cur.execute(
+            f"SELECT batch_id, status, COUNT(*) FROM outbound_emails WHERE batch_id IN ({', '.join(['%s'] * len(batch_ids))}) "
+            f"GROUP BY batch_id, status",
+            list(batch_ids),
+        )
+        for batch_id, status, n in cur.fetchall():
+            key = status if status in ("sent", "failed") else "pending"
+            progress[batch_id][key] += int(n)
+    return progress
+
+
+def recent_outbound_emails(limit=20):
+    """Latest single emails and bulk batches (with progress) for the messages page."""
+    conn = get_db_connection()
+    if not conn:
+        return [], []
+    try:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(
+                "SELECT id, to_email, subject, status, attempts, next_attempt_at, last_error, created_at, sent_at "
+                "FROM outbound_emails WHERE batch_id IS NULL ORDER BY created_at DESC, id DESC LIMIT %s",
+                (limit,),
+            )
+            emails = cur.fetchall()
+            cur.execute(
+                "SELECT id, subject, audience, recipient_count, created_at FROM outbound_batches ORDER BY id DESC LIMIT %s",
+                (limit,),
+            )
+            batches = cur.fetchall()
+        with conn.cursor() as cur:
+            progress = outbound_batch_progress(cur, [b["id"] for b in batches])
+        for b in batches:
+            b.update(progress[b["id"]])
+        return emails, batches
+    except Error as e:
+        app.logger.error(f"Outbound email list error: {e}")
+        return [], []
+    finally:
+        conn.close()
+
+
+@app.route("/admin/messages/status.json")
+@admin_required
+def admin_messages_status():
+    """Delivery status for ?ids=1,2,3 and/or ?batches=4,5 (polled by the messages page)."""
+    def id_list(name):
+        return [int(x) for x in (request.args.get(name) or "").split(",") if x.strip().isdigit()][:100]
+
+    ids, batch_ids = id_list("ids"), id_list("batches")
+    if not ids and not batch_ids:
+        return jsonify({"jobs": [], "batches": []})
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "database_unavailable"}), 503
+    jobs = []
+    try:
+        if ids:
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(
+                    f"SELECT id, status, attempts, next_attempt_at, last_error, sent_at FROM outbound_emails "
+                    f"WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                    ids,
+                )
+                jobs = cur.fetchall()
+        with conn.cursor() as cur:
+            progress = outbound_batch_progress(cur, batch_ids)
+    except Error as e:
+        app.logger.error(f"Outbound email status error: {e}")
+        return jsonify({"error": "query_failed"}), 500
+    finally:
+        conn.close()
+    for job in jobs:
+        for key in ("next_attempt_at", "sent_at"):
+            job[key] = job[key].isoformat() if job[key] else None
+    return jsonify({"jobs": jobs, "batches": [dict(id=bid, **p) for bid, p in progress.items()]})
+
+
 # ---------------------- Admin Messaging ----------------------
 @app.route("/admin/messages", methods=["GET", "POST"])
 @admin_required
@@ -1540,64 +4447,61 @@ def admin_messages():
     if request.method == "POST":
         # Common attachment handling
         attachment_filename = None
-        attachment_path = None
+        attachment_name = None
         attachment_url = None
         file = request.files.get("attachment")
         if file and file.filename:
             if not allowed_attachment(file.filename):
                 flash("Invalid attachment type.", "danger")
                 return render_template("admin/message_form.html", wa_url=None)
-            safe_name = secure_filename(file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            name_noext, ext = os.path.splitext(safe_name)
-            attachment_filename = f"{name_noext}-{timestamp}{ext}"
-            attachment_path = os.path.join(app.static_folder, UPLOAD_SUBDIR, attachment_filename)
-            file.save(attachment_path)
+            attachment_name = secure_filename(file.filename)
+            try:
+                attachment_filename = store_upload(file)
+            except UploadTooLarge as e:
+                flash(f"Attachment too large: {e}.", "danger")
+                return redirect(url_for("admin_messages"))
             try:
                 # absolute URL for WhatsApp sharing
                 attachment_url = url_for('static', filename=f"{UPLOAD_SUBDIR}/{attachment_filename}", _external=True)
             except Exception:
                 attachment_url = None
 
-        # Send Email via SMTP if selected
+        # Queue the email(s) for the mail worker if selected
         if request.form.get("send_email") == "on":
-            to_email = (request.form.get("to_email") or "").strip()
-            subject = (request.form.get("subject") or "").strip() or "(no subject)"
+            mode = request.form.get("recipient_mode") or "single"
+            subject = ((request.form.get("subject") or "").strip() or "(no subject)")[:255]
             body = (request.form.get("body") or "").strip()
-            if not to_email:
-                flash("Recipient email is required to send.", "danger")
+            if mode == "single":
+                to_email = (request.form.get("to_email") or "").strip()
+                if not to_email:
+                    flash("Recipient email is required to send.", "danger")
+                else:
+                    job_id = enqueue_email(to_email, subject, body, attachment_filename, attachment_name)
+                    if job_id:
+                        flash(f"Email queued as job #{job_id}; delivery status is shown below.", "success")
+                    else:
+                        flash("Failed to queue email. Please try again.", "danger")
             else:
-                smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-                smtp_port = int(os.getenv("SMTP_PORT", "587"))
-                smtp_user = os.getenv("SMTP_USER", "")
-                smtp_pass = os.getenv("SMTP_PASS", "")
-                smtp_use_tls = (os.getenv("SMTP_USE_TLS", "true").lower() != "false")
-                email_from = os.getenv("EMAIL_FROM", smtp_user or "no-reply@example.com")
-
-                msg = EmailMessage()
-                msg["From"] = email_from
-                msg["To"] = to_email
-                msg["Subject"] = subject
-                msg.set_content(body or "")
-                # Attachment
-                if attachment_path and os.path.exists(attachment_path):
-                    ctype, encoding = mimetypes.guess_type(attachment_path)
-                    if ctype is None:
-                        ctype = "application/octet-stream"
-                    maintype, subtype = ctype.split("/", 1)
-                    with open(attachment_path, "rb") as f:
-                        msg.add_attachment(f.read(), maintype=maintype, subtype=subtype, filename=attachment_filename)
-                try:
-                    with smtplib.SMTP(smtp_host, smtp_port, timeout=20) as server:
-                        if smtp_use_tls:
-                            server.starttls()
-                        if smtp_user and smtp_pass:
-                            server.login(smtp_user, smtp_pass)
-                        server.send_message(msg)
-                    flash("Email sent successfully.", "success")
-                except Exception as e:
-                    app.logger.error(f"SMTP send error: {e}")
-                    flash("Failed to send email. Check SMTP settings.", "danger")
+                if mode == "employees":
+                    active_only = request.form.get("emp_active_only") == "on"
+                    position = (request.form.get("emp_position") or "").strip()
+                    recipients = employee_recipients(active_only, position) or []
+                    audience = "Employees" + (" (active)" if active_only else "") + (f", position ~ {position}" if position else "")
+                else:
+                    recipients, invalid = parse_recipient_list(request.form.get("to_list"))
+                    audience = f"List of {len(recipients)}"
+                    if invalid:
+                        flash(f"Skipped invalid address(es): {', '.join(invalid[:10])}", "warning")
+                if not recipients:
+                    flash("No recipients matched.", "danger")
+                elif len(recipients) > MAIL_BULK_MAX:
+                    flash(f"Too many recipients ({len(recipients)}); the limit is {MAIL_BULK_MAX}.", "danger")
+                else:
+                    batch_id = enqueue_bulk_email(recipients, subject, body, attachment_filename, attachment_name, audience)
+                    if batch_id:
+                        flash(f"Bulk send #{batch_id} queued for {len(recipients)} recipient(s).", "success")
+                    else:
+                        flash("Failed to queue bulk send. Please try again.", "danger")
 
         # Build WhatsApp link if selected
         if request.form.get("make_whatsapp") == "on":
@@ -1613,38 +4517,14 @@ def admin_messages():
                 wa_url = f"https://wa.me/{phone_digits}?text={quote_plus(wa_text)}"
                 flash("WhatsApp link generated below.", "info")
 
-    return render_template("admin/message_form.html", wa_url=wa_url)
+    outbound, batches = recent_outbound_emails()
+    return render_template("admin/message_form.html", wa_url=wa_url, outbound=outbound, batches=batches)
 
 
 # ---------------------- Admin Settings: Email (Gmail SMTP) ----------------------
 @app.route("/admin/settings/email", methods=["GET", "POST"])
 @admin_required
 def admin_email_settings():
-    # Determine .env path relative to this file
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    env_path = os.path.join(base_dir, ".env")
-
-    def read_env_lines(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read().splitlines()
-        except FileNotFoundError:
-            return []
-
-    def write_env_lines(path, lines):
-        with open(path, "w", encoding="utf-8") as f:
-            f.write("\n".join(lines) + "\n")
-
-    # Keys we manage from UI
-    managed_keys = [
-        "SMTP_HOST",
-        "SMTP_PORT",
-        "SMTP_USER",
-        "SMTP_PASS",
-        "SMTP_USE_TLS",
-        "EMAIL_FROM",
-    ]
-
     if request.method == "POST":
         # Collect submitted values
         new_values = {
@@ -1655,47 +4535,41 @@ def admin_email_settings():
             "SMTP_USE_TLS": "true" if (request.form.get("SMTP_USE_TLS") == "on") else "false",
             "EMAIL_FROM": (request.form.get("EMAIL_FROM") or "").strip(),
         }
-
-        # Read current .env, update or append managed keys
-        lines = read_env_lines(env_path)
-        updated = set()
-        out_lines = []
-        for line in lines:
-            stripped = line.strip()
-            if not stripped or stripped.startswith("#") or "=" not in stripped:
-                out_lines.append(line)
-                continue
-            key, _, _ = stripped.partition("=")
-            if key in managed_keys:
-                out_lines.append(f"{key}={new_values[key]}")
-                updated.add(key)
-            else:
-                out_lines.append(line)
-        # Append any new keys not present
-        for k in managed_keys:
-            if k not in updated:
-                out_lines.append(f"{k}={new_values[k]}")
-
-        write_env_lines(env_path, out_lines)
-        # Reload environment for this process
+        if not new_values["SMTP_PASS"]:
+            del new_values["SMTP_PASS"]  # empty field keeps the current password
+        expected = request.form.get("settings_version", "")
         try:
-            load_dotenv(dotenv_path=env_path, override=True)
-        except Exception:
-            pass
+            update_env_file(new_values, int(expected) if expected.isdigit() else None)
+        except SettingsConflict:
+            flash("Settings were changed elsewhere while you were editing. Review them and save again.", "warning")
+            return redirect(url_for("admin_email_settings"))
+        except OSError as e:
+            app.logger.error(f"Saving .env failed: {e}")
+            flash("Could not save settings.", "danger")
+            return redirect(url_for("admin_email_settings"))
         flash("SMTP settings saved.", "success")
         return redirect(url_for("admin_email_settings"))
 
-    # GET: load current values from env (after load_dotenv at startup)
+    # GET: current values from the settings snapshot
+    settings = current_settings()
     current = {
-        "SMTP_HOST": os.getenv("SMTP_HOST", "smtp.gmail.com"),
-        "SMTP_PORT": os.getenv("SMTP_PORT", "587"),
-        "SMTP_USER": os.getenv("SMTP_USER", ""),
+        "SMTP_HOST": settings.get("SMTP_HOST", "smtp.gmail.com"),
+        "SMTP_PORT": settings.get("SMTP_PORT", "587"),
+        "SMTP_USER": settings.get("SMTP_USER", ""),
         # Do not expose real password; just indicate if set
-        "SMTP_PASS_SET": bool(os.getenv("SMTP_PASS", "")),
-        "SMTP_USE_TLS": os.getenv("SMTP_USE_TLS", "true"),
-        "EMAIL_FROM": os.getenv("EMAIL_FROM", os.getenv("SMTP_USER", "")),
+        "SMTP_PASS_SET": bool(settings.get("SMTP_PASS", "")),
+        "SMTP_USE_TLS": settings.get("SMTP_USE_TLS", "true"),
+        "EMAIL_FROM": settings.get("EMAIL_FROM", settings.get("SMTP_USER", "")),
     }
-    return render_template("admin/email_settings.html", current=current)
+    return render_template("admin/email_settings.html", current=current, settings_version=settings_version(settings))
+
+# Apply pending migrations once per process at startup (disable with DB_AUTO_MIGRATE=false
+# when migrations are run as a separate deploy step).
+if os.getenv("DB_AUTO_MIGRATE", "true").lower() != "false":
+    try:
+        run_migrations()
+    except Exception as e:
+        app.logger.error(f"Startup migrations failed: {e}")
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=True)
@@ -0,0 +1,3 @@
+-- auth_logs tables created by builds before device tracking lack this column.
+-- "Duplicate column" is treated as already applied by the migration runner.
+ALTER TABLE `auth_logs` ADD COLUMN `device_type` varchar(20) COLLATE utf8mb4_unicode_ci DEFAULT NULL AFTER `user_agent`;
@@ -0,0 +1,4 @@
+-- Public pages derive ETag / Last-Modified from MAX(updated_at); index it so that is a lookup.
+ALTER TABLE `services` ADD KEY `idx_services_updated_at` (`updated_at`);
+ALTER TABLE `employees` ADD KEY `idx_employees_updated_at` (`updated_at`);
+ALTER TABLE `tasks` ADD KEY `idx_tasks_updated_at` (`updated_at`);
@@ -0,0 +1,42 @@
+-- Materialized row counts for the admin dashboard, kept current by triggers so the
+-- dashboard never runs COUNT(*) over growing tables. `flask --app app stats-reconcile`
+-- recounts from scratch (run it after bulk loads or periodically from cron).
+CREATE TABLE IF NOT EXISTS `stat_counters` (
+  `name` varchar(50) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `value` bigint NOT NULL DEFAULT '0',
+  `updated_at` datetime NOT NULL,
+  `reconciled_at` datetime NOT NULL,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TRIGGER `trg_contacts_count_ins` AFTER INSERT ON `contacts` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` + 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'contacts';
+CREATE TRIGGER `trg_contacts_count_del` AFTER DELETE ON `contacts` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` - 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'contacts';
+CREATE TRIGGER `trg_services_count_ins` AFTER INSERT ON `services` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` + 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'services';
+CREATE TRIGGER `trg_services_count_del` AFTER DELETE ON `services` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` - 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'services';
+CREATE TRIGGER `trg_employees_count_ins` AFTER INSERT ON `employees` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` + 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'employees';
+CREATE TRIGGER `trg_employees_count_del` AFTER DELETE ON `employees` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` - 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'employees';
+CREATE TRIGGER `trg_tasks_count_ins` AFTER INSERT ON `tasks` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` + 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'tasks';
+CREATE TRIGGER `trg_tasks_count_del` AFTER DELETE ON `tasks` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` - 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'tasks';
+CREATE TRIGGER `trg_admin_actions_count_ins` AFTER INSERT ON `admin_actions` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` + 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'actions';
+CREATE TRIGGER `trg_admin_actions_count_del` AFTER DELETE ON `admin_actions` FOR EACH ROW
+  UPDATE `stat_counters` SET `value` = `value` - 1, `updated_at` = UTC_TIMESTAMP() WHERE `name` = 'actions';
+
+-- Seed after the triggers exist so no insert falls between the count and the trigger.
+REPLACE INTO `stat_counters` (`name`, `value`, `updated_at`, `reconciled_at`)
+  SELECT 'contacts', COUNT(*), UTC_TIMESTAMP(), UTC_TIMESTAMP() FROM `contacts`
+  UNION ALL SELECT 'services', COUNT(*), UTC_TIMESTAMP(), UTC_TIMESTAMP() FROM `services`
+  UNION ALL SELECT 'employees', COUNT(*), UTC_TIMESTAMP(), UTC_TIMESTAMP() FROM `employees`
+  UNION ALL SELECT 'tasks', COUNT(*), UTC_TIMESTAMP(), UTC_TIMESTAMP() FROM `tasks`
+  UNION ALL SELECT 'actions', COUNT(*), UTC_TIMESTAMP(), UTC_TIMESTAMP() FROM `admin_actions`;
+
+-- "Latest contacts" on the dashboard orders by created_at.
+ALTER TABLE `contacts` ADD KEY `idx_contacts_created_at` (`created_at`);
@@ -0,0 +1,20 @@
+-- admin_activity filters in SQL and pages by keyset on (at, id); each filter column
+-- leads a composite index that ends in (at, id) so every page is a short range scan.
+
+-- Rows written before device tracking have no device_type; classify them the same way
+-- _detect_device_type() does so the device filter can be a plain indexed predicate.
+UPDATE `auth_logs`
+SET `device_type` = CASE
+  WHEN `user_agent` IS NULL OR `user_agent` = '' THEN 'unknown'
+  WHEN LOWER(`user_agent`) LIKE '%mobi%' OR LOWER(`user_agent`) LIKE '%android%'
+    OR LOWER(`user_agent`) LIKE '%iphone%' OR LOWER(`user_agent`) LIKE '%ipad%' THEN 'mobile'
+  ELSE 'desktop'
+END
+WHERE `device_type` IS NULL;
+
+ALTER TABLE `auth_logs`
+  ADD KEY `idx_auth_logs_at_id` (`at`, `id`),
+  ADD KEY `idx_auth_logs_device_at` (`device_type`, `at`, `id`),
+  ADD KEY `idx_auth_logs_action_at` (`action`, `at`, `id`),
+  ADD KEY `idx_auth_logs_username_at` (`username`, `at`, `id`),
+  ADD KEY `idx_auth_logs_user_id_at` (`user_id`, `at`, `id`);
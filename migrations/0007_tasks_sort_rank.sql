@@ -0,0 +1,13 @@
+-- Task lists sort by status (blocked, in_progress, todo, done), then due date with
+-- undated tasks last. Materialize both as stored generated columns so composite indexes
+-- can deliver rows already in order instead of ORDER BY FIELD(...) + filesort.
+ALTER TABLE `tasks` ADD COLUMN `status_rank` tinyint UNSIGNED
+  AS (CASE `status` WHEN 'blocked' THEN 1 WHEN 'in_progress' THEN 2 WHEN 'todo' THEN 3 ELSE 4 END) STORED;
+ALTER TABLE `tasks` ADD COLUMN `due_sort` date
+  AS (COALESCE(`due_date`, '9999-12-31')) STORED;
+
+-- my_tasks: WHERE employee_id = ? ORDER BY status_rank, due_sort, updated_at DESC, id DESC
+ALTER TABLE `tasks` ADD KEY `idx_tasks_emp_rank_updated` (`employee_id`, `status_rank`, `due_sort`, `updated_at` DESC, `id` DESC);
+-- admin_tasks_list: ORDER BY status_rank, due_sort, created_at DESC, id DESC (optionally per assignee)
+ALTER TABLE `tasks` ADD KEY `idx_tasks_rank_created` (`status_rank`, `due_sort`, `created_at` DESC, `id` DESC);
+ALTER TABLE `tasks` ADD KEY `idx_tasks_emp_rank_created` (`employee_id`, `status_rank`, `due_sort`, `created_at` DESC, `id` DESC);
@@ -0,0 +1,2 @@
+-- Text search on the admin task list uses MATCH ... AGAINST instead of a leading-wildcard LIKE.
+ALTER TABLE `tasks` ADD FULLTEXT KEY `ft_tasks_title_description` (`title`, `description`);
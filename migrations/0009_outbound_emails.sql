@@ -0,0 +1,22 @@
+-- Persistent outbound email queue. admin_messages inserts a row and returns; the
+-- `flask --app app mail-worker` process claims due rows (status, next_attempt_at) with
+-- SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run side by side.
+CREATE TABLE IF NOT EXISTS `outbound_emails` (
+  `id` int UNSIGNED NOT NULL AUTO_INCREMENT,
+  `to_email` varchar(190) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `subject` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `body` mediumtext COLLATE utf8mb4_unicode_ci,
+  `attachment_filename` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `status` enum('queued','sending','sent','failed') COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'queued',
+  `attempts` smallint UNSIGNED NOT NULL DEFAULT '0',
+  `next_attempt_at` datetime NOT NULL,
+  `locked_by` varchar(100) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `locked_at` datetime DEFAULT NULL,
+  `last_error` varchar(500) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `created_at` datetime NOT NULL,
+  `updated_at` datetime NOT NULL,
+  `sent_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_outbound_due` (`status`, `next_attempt_at`, `id`),
+  KEY `idx_outbound_created` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,16 @@
+-- Bulk sends from Admin Messages: employees get an email address to target, and each
+-- bulk send is one outbound_batches row grouping its per-recipient outbound_emails.
+ALTER TABLE `employees` ADD COLUMN `email` varchar(190) COLLATE utf8mb4_unicode_ci DEFAULT NULL AFTER `position`;
+
+CREATE TABLE IF NOT EXISTS `outbound_batches` (
+  `id` int UNSIGNED NOT NULL AUTO_INCREMENT,
+  `subject` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `audience` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `recipient_count` int UNSIGNED NOT NULL DEFAULT '0',
+  `created_at` datetime NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE `outbound_emails` ADD COLUMN `batch_id` int UNSIGNED DEFAULT NULL AFTER `id`;
+
+ALTER TABLE `outbound_emails` ADD KEY `idx_outbound_batch` (`batch_id`, `status`);
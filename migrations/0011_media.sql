@@ -0,0 +1,19 @@
+-- One row per uploaded image. Upload handlers insert it as 'pending'; the
+-- `flask --app app media-worker` process claims pending rows, generates the resized
+-- variants in a process pool and records the outcome here.
+CREATE TABLE IF NOT EXISTS `media` (
+  `id` int UNSIGNED NOT NULL AUTO_INCREMENT,
+  `filename` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `status` enum('pending','processing','ready','failed') COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'pending',
+  `variants` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `attempts` smallint UNSIGNED NOT NULL DEFAULT '0',
+  `last_error` varchar(500) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `locked_at` datetime DEFAULT NULL,
+  `created_at` datetime NOT NULL,
+  `updated_at` datetime NOT NULL,
+  `processed_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uniq_media_filename` (`filename`),
+  KEY `idx_media_status` (`status`, `id`),
+  KEY `idx_media_updated_at` (`updated_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,54 @@
+-- Content-addressed uploads: files are stored as <sha256><ext>, so identical uploads share
+-- one file and one media row. ref_count tracks how many services / employees / tasks use
+-- the file and is kept current by triggers; `flask --app app media-gc` recounts it and
+-- deletes unreferenced files.
+ALTER TABLE `media` ADD COLUMN `sha256` char(64) COLLATE utf8mb4_unicode_ci DEFAULT NULL AFTER `filename`;
+ALTER TABLE `media` ADD COLUMN `size_bytes` bigint UNSIGNED DEFAULT NULL AFTER `sha256`;
+ALTER TABLE `media` ADD COLUMN `ref_count` int NOT NULL DEFAULT '0' AFTER `size_bytes`;
+ALTER TABLE `media` ADD KEY `idx_media_sha256` (`sha256`);
+ALTER TABLE `media` ADD KEY `idx_media_gc` (`ref_count`, `updated_at`);
+
+-- Reference lookups for the garbage collector's recount
+ALTER TABLE `services` ADD KEY `idx_services_image_filename` (`image_filename`);
+ALTER TABLE `employees` ADD KEY `idx_employees_photo_filename` (`photo_filename`);
+ALTER TABLE `tasks` ADD KEY `idx_tasks_attachment_filename` (`attachment_filename`);
+ALTER TABLE `outbound_emails` ADD KEY `idx_outbound_attachment` (`attachment_filename`);
+
+-- Message attachments keep their original name for the email; the stored file is hashed
+ALTER TABLE `outbound_emails` ADD COLUMN `attachment_name` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL AFTER `attachment_filename`;
+
+-- On update, (filename <=> NEW) - (filename <=> OLD) nets to zero when the file is unchanged.
+CREATE TRIGGER `trg_services_media_ins` AFTER INSERT ON `services` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` + 1 WHERE `filename` = NEW.`image_filename`;
+CREATE TRIGGER `trg_services_media_upd` AFTER UPDATE ON `services` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` + (`filename` <=> NEW.`image_filename`) - (`filename` <=> OLD.`image_filename`)
+  WHERE `filename` IN (OLD.`image_filename`, NEW.`image_filename`);
+CREATE TRIGGER `trg_services_media_del` AFTER DELETE ON `services` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` - 1 WHERE `filename` = OLD.`image_filename`;
+CREATE TRIGGER `trg_employees_media_ins` AFTER INSERT ON `employees` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` + 1 WHERE `filename` = NEW.`photo_filename`;
+CREATE TRIGGER `trg_employees_media_upd` AFTER UPDATE ON `employees` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` + (`filename` <=> NEW.`photo_filename`) - (`filename` <=> OLD.`photo_filename`)
+  WHERE `filename` IN (OLD.`photo_filename`, NEW.`photo_filename`);
+CREATE TRIGGER `trg_employees_media_del` AFTER DELETE ON `employees` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` - 1 WHERE `filename` = OLD.`photo_filename`;
+CREATE TRIGGER `trg_tasks_media_ins` AFTER INSERT ON `tasks` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` + 1 WHERE `filename` = NEW.`attachment_filename`;
+CREATE TRIGGER `trg_tasks_media_upd` AFTER UPDATE ON `tasks` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` + (`filename` <=> NEW.`attachment_filename`) - (`filename` <=> OLD.`attachment_filename`)
+  WHERE `filename` IN (OLD.`attachment_filename`, NEW.`attachment_filename`);
+CREATE TRIGGER `trg_tasks_media_del` AFTER DELETE ON `tasks` FOR EACH ROW
+  UPDATE `media` SET `ref_count` = `ref_count` - 1 WHERE `filename` = OLD.`attachment_filename`;
+
+-- Register files referenced before this migration (after the triggers, as in 0004), then count.
+INSERT IGNORE INTO `media` (`filename`, `status`, `created_at`, `updated_at`)
+  SELECT f, IF(f REGEXP '\\.(png|jpe?g|webp)$', 'pending', 'ready'), UTC_TIMESTAMP(), UTC_TIMESTAMP()
+  FROM (
+    SELECT `image_filename` AS f FROM `services` WHERE `image_filename` IS NOT NULL
+    UNION SELECT `photo_filename` FROM `employees` WHERE `photo_filename` IS NOT NULL
+    UNION SELECT `attachment_filename` FROM `tasks` WHERE `attachment_filename` IS NOT NULL
+  ) AS refs;
+UPDATE `media` m SET `ref_count` =
+  (SELECT COUNT(*) FROM `services` s WHERE s.`image_filename` = m.`filename`)
+  + (SELECT COUNT(*) FROM `employees` e WHERE e.`photo_filename` = m.`filename`)
+  + (SELECT COUNT(*) FROM `tasks` t WHERE t.`attachment_filename` = m.`filename`);
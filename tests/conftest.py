@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Import the app without touching a database at collection time
+os.environ.setdefault("DB_AUTO_MIGRATE", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
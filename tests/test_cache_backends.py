@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+import app as vk
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def backend(client):
+    return vk.RedisCacheBackend(client=client)
+
+
+def test_get_set_roundtrip(backend):
+    assert backend.get("missing") is None
+    value = {"rows": [{"id": 1, "name": "Alpha"}], "total": 1}
+    backend.set("k", value)
+    assert backend.get("k") == value
+    assert backend.get_many(["k", "missing"]) == [value, None]
+    assert backend.get_many([]) == []
+    backend.delete("k")
+    assert backend.get("k") is None
+
+
+def test_set_applies_ttl(backend, client):
+    backend.set("short", "v", ttl=1)
+    backend.set("forever", "v")
+    assert 0 < client.ttl("short") <= 1
+    assert client.ttl("forever") == -1
+    time.sleep(1.1)
+    assert backend.get("short") is None
+    assert backend.get("forever") == "v"
+
+
+def test_incr_counter_reads_back_as_int(backend, client):
+    assert backend.incr("gen") == 1
+    assert backend.incr("gen") == 2
+    assert client.get("gen") == b"2"  # a plain INCR value, not a pickle
+    assert backend.get("gen") == 2
+    assert backend.get_many(["gen"]) == [2]
+
+
+def test_invalidate_bumps_tag_generation(backend):
+    cache = vk.Cache(backend, "t")
+    cache.set("services", ["a"], 60, tags=("services",))
+    cache.set("employees", ["b"], 60, tags=("employees",))
+    assert cache.get("services", ("services",)) == ["a"]
+
+    cache.invalidate("services")
+
+    assert backend.get(cache._gen_key("services")) == 1
+    assert cache.get("services", ("services",)) is None
+    assert cache.get("employees", ("employees",)) == ["b"]  # other tags untouched
+    cache.set("services", ["c"], 60, tags=("services",))
+    assert cache.get("services", ("services",)) == ["c"]
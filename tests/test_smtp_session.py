@@ -0,0 +1,180 @@
+import os
+import socket
+from datetime import datetime
+from email import message_from_bytes, policy
+
+import pytest
+
+import app as vk
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller  # noqa: E402
+
+
+class RecordingHandler:
+    """Keeps every accepted message with the client port it arrived on (one port per connection)."""
+
+    def __init__(self):
+        self.messages = []
+        self.rcpt_replies = {}  # address -> reply to RCPT TO instead of accepting it
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        reply = self.rcpt_replies.get(address)
+        if reply:
+            return reply
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer[1], envelope.rcpt_tos, envelope.original_content))
+        return "250 OK"
+
+    @property
+    def connections(self):
+        return len({port for port, _, _ in self.messages})
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    try:
+        yield handler, {
+            "host": controller.hostname,
+            "port": controller.port,
+            "user": "",
+            "password": "",
+            "use_tls": False,
+            "from": "no-reply@example.com",
+        }
+    finally:
+        controller.stop()
+
+
+def _row(n, body="Hello"):
+    return {"to_email": f"user{n}@example.com", "subject": f"Message {n}", "body": body}
+
+
+def test_messages_share_one_connection(smtp_server):
+    handler, settings = smtp_server
+    with vk.SMTPSession(settings, max_per_connection=100) as smtp:
+        for n in range(5):
+            smtp.send(vk.build_email(_row(n), settings["from"]))
+    assert smtp.sent == 5
+    assert smtp.connections == 1
+    assert handler.connections == 1
+    assert [rcpt for _, rcpt, _ in handler.messages] == [[f"user{n}@example.com"] for n in range(5)]
+
+
+def test_reconnects_after_max_per_connection(smtp_server):
+    handler, settings = smtp_server
+    with vk.SMTPSession(settings, max_per_connection=2) as smtp:
+        for n in range(5):
+            smtp.send(vk.build_email(_row(n), settings["from"]))
+    assert smtp.sent == 5
+    assert smtp.connections == 3
+    assert handler.connections == 3
+    ports = [port for port, _, _ in handler.messages]
+    assert ports[0] == ports[1] != ports[2] == ports[3] != ports[4]
+
+
+def test_streamed_attachment_arrives_intact(smtp_server, tmp_path, monkeypatch):
+    handler, settings = smtp_server
+    monkeypatch.setattr(vk.app, "static_folder", str(tmp_path))
+    monkeypatch.setattr(vk, "ATTACHMENT_SPOOL_MEMORY", 16 * 1024)  # spill the encoding to disk
+    (tmp_path / vk.UPLOAD_SUBDIR).mkdir()
+    payload = os.urandom(3 * vk.UPLOAD_CHUNK_SIZE + 123)
+    (tmp_path / vk.UPLOAD_SUBDIR / "report.pdf").write_bytes(payload)
+    # Lines starting with "." must be dot-stuffed on the wire and arrive unchanged
+    body = ".leading dot\n..two dots\n.\nlast line"
+
+    attachment = vk.EncodedAttachment("report.pdf", "Report.pdf")
+    try:
+        with vk.SMTPSession(settings) as smtp:
+            for n in range(2):
+                smtp.send(vk.build_email(_row(n, body), settings["from"], attachment), attachment)
+    finally:
+        attachment.close()
+
+    assert smtp.sent == 2
+    assert handler.connections == 1
+    for _, _, raw in handler.messages:
+        msg = message_from_bytes(raw, policy=policy.default)
+        text, part = list(msg.iter_parts())
+        assert text.get_content().replace("\r\n", "\n").rstrip("\n") == body
+        assert part.get_filename() == "Report.pdf"
+        assert part.get_content_type() == "application/pdf"
+        assert part.get_payload(decode=True) == payload
+
+
+class OutboxConnection:
+    """Just enough of a DB connection for process_outbound_emails: serves `rows` to the claim
+    query and records every other statement."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def cursor(self, **kwargs):
+        return OutboxCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class OutboxCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.conn.statements.append((" ".join(sql.split()), params))
+        self._result = self.conn.rows if "FOR UPDATE SKIP LOCKED" in sql else []
+        self.rowcount = len(self._result) or 1
+
+    def fetchall(self):
+        return self._result
+
+
+def test_temporary_rcpt_refusal_stays_queued(smtp_server, monkeypatch):
+    handler, settings = smtp_server
+    handler.rcpt_replies["user1@example.com"] = "451 4.7.1 Greylisted, try again later"
+    monkeypatch.setattr(vk, "smtp_settings", lambda: settings)
+    row = dict(_row(1), id=7, attachment_filename=None, attachment_name=None, attempts=0)
+    conn = OutboxConnection([row])
+
+    assert vk.process_outbound_emails(conn, "test-worker") == 1
+
+    assert handler.messages == []
+    sql, params = next((sql, p) for sql, p in conn.statements if sql.startswith("UPDATE outbound_emails SET status=%s"))
+    status, attempts, next_attempt_at = params[:3]
+    assert status == "queued"
+    assert attempts == 1
+    assert next_attempt_at > datetime.utcnow()
+    assert "451" in params[4]
+
+
+def test_rcpt_refusal_codes_decide_permanence():
+    greylisted = vk.smtplib.SMTPRecipientsRefused({"a@example.com": (451, b"later")})
+    mixed = vk.smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no"), "b@example.com": (452, b"full")})
+    rejected = vk.smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")})
+    assert not vk.is_permanent_mail_error(greylisted)
+    assert not vk.is_permanent_mail_error(mixed)
+    assert vk.is_permanent_mail_error(rejected)
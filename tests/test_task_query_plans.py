@@ -0,0 +1,107 @@
+"""EXPLAIN the task list queries against a scratch MySQL database.
+
+Uses the DB_* settings from the environment/.env to reach the server and creates (then
+drops) its own database, TEST_DB_NAME (default: <DB_NAME>_plan_test). Skipped when the
+server cannot be reached.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from mysql.connector import Error
+
+import app as vk
+
+TEST_DB_NAME = os.getenv("TEST_DB_NAME") or f"{vk.DB_CONFIG['database']}_plan_test"
+EMPLOYEES = 40
+TASKS_PER_EMPLOYEE = 100
+
+
+def _seed(conn):
+    now = datetime(2025, 1, 1)
+    statuses = ("todo", "in_progress", "done", "blocked")
+    with conn.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO employees (name, position, created_at, updated_at) VALUES (%s, %s, %s, %s)",
+            [(f"Employee {i}", "Engineer", now, now) for i in range(EMPLOYEES)],
+        )
+        cur.execute("SELECT id FROM employees")
+        employee_ids = [row[0] for row in cur.fetchall()]
+        rows = []
+        for n in range(EMPLOYEES * TASKS_PER_EMPLOYEE):
+            created = now + timedelta(minutes=n)
+            due = None if n % 5 == 0 else date(2025, 1, 1) + timedelta(days=n % 90)
+            rows.append(
+                (f"Task {n}", employee_ids[n % EMPLOYEES], statuses[n % 4], due, created, created)
+            )
+        cur.executemany(
+            "INSERT INTO tasks (title, employee_id, status, due_date, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+        conn.commit()
+        cur.execute("ANALYZE TABLE employees, tasks")
+        cur.fetchall()
+    return employee_ids
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    server = {k: v for k, v in vk.DB_CONFIG.items() if k != "database"}
+    try:
+        admin = vk.mysql.connector.connect(connection_timeout=3, **server)
+    except Error as e:
+        pytest.skip(f"MySQL not available: {e}")
+    with admin.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS `{TEST_DB_NAME}`")
+        cur.execute(f"CREATE DATABASE `{TEST_DB_NAME}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    conn = vk.mysql.connector.connect(database=TEST_DB_NAME, **server)
+    try:
+        vk.run_migrations(conn)
+        employee_ids = _seed(conn)
+        yield conn, employee_ids
+    finally:
+        conn.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS `{TEST_DB_NAME}`")
+        admin.close()
+
+
+def explain(conn, sql, params):
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute("EXPLAIN " + sql, params)
+        return cur.fetchall()
+
+
+def admin_tasks_sql(where_clause=""):
+    # As admin_tasks_list runs it: one page plus a lookahead row
+    return vk.ADMIN_TASKS_SQL.format(where_clause=where_clause) + " LIMIT %s"
+
+
+@pytest.mark.parametrize(
+    "name, sql, params, index",
+    [
+        ("my_tasks", vk.MY_TASKS_SQL, lambda emp: (emp,), "idx_tasks_emp_rank_updated"),
+        ("admin", admin_tasks_sql(), lambda emp: (vk.TASKS_PAGE_SIZE + 1,), "idx_tasks_rank_created"),
+        (
+            "admin?status",
+            admin_tasks_sql(" WHERE t.status_rank=%s"),
+            lambda emp: (vk.TASK_STATUS_RANK["todo"], vk.TASKS_PAGE_SIZE + 1),
+            "idx_tasks_rank_created",
+        ),
+        (
+            "admin?assignee",
+            admin_tasks_sql(" WHERE t.employee_id=%s"),
+            lambda emp: (emp, vk.TASKS_PAGE_SIZE + 1),
+            "idx_tasks_emp_rank_created",
+        ),
+    ],
+)
+def test_task_list_uses_sort_index(plan_db, name, sql, params, index):
+    conn, employee_ids = plan_db
+    plan = explain(conn, sql, params(employee_ids[0]))
+    tasks_row = next(row for row in plan if row["table"] == "t")
+    extra = " ".join(row.get("Extra") or "" for row in plan)
+    assert tasks_row["key"] == index, f"{name}: {plan}"
+    assert "filesort" not in extra, f"{name}: {extra}"
+    assert "temporary" not in extra, f"{name}: {extra}"